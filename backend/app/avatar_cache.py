@@ -0,0 +1,105 @@
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional
+import asyncio
+import glob
+import os
+
+import aiofiles
+
+from app.metrics import cache_result
+from app.scheduler import single_flight
+
+
+class AvatarCache:
+    """Profile photos on disk, keyed by entity id + photo id, with an in-memory LRU"""
+
+    def __init__(self, directory: str, memory_budget: int):
+        self.directory = directory
+        self.memory_budget = memory_budget
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._memory_bytes = 0
+        self._inflight: Dict[str, asyncio.Task] = {}
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def _key(entity_id: int, photo_id: int) -> str:
+        return f"{entity_id}_{photo_id}"
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.jpg")
+
+    def _remember(self, key: str, data: bytes):
+        """Add to the memory layer, evicting least recently used entries"""
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            return
+        self._memory[key] = data
+        self._memory_bytes += len(data)
+        while self._memory_bytes > self.memory_budget and len(self._memory) > 1:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+
+    async def get(self, entity_id: int, photo_id: int) -> Optional[bytes]:
+        """Cached photo bytes, or None if this photo_id was never stored"""
+        key = self._key(entity_id, photo_id)
+        data = self._memory.get(key)
+        if data is not None:
+            self._memory.move_to_end(key)
+            return data
+
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        async with aiofiles.open(path, 'rb') as f:
+            data = await f.read()
+        self._remember(key, data)
+        return data
+
+    async def put(self, entity_id: int, photo_id: int, data: bytes):
+        """Store a photo and drop older photos of the same entity"""
+        key = self._key(entity_id, photo_id)
+        self._remember(key, data)
+
+        path = self._path(key)
+        tmp_path = path + ".tmp"
+        async with aiofiles.open(tmp_path, 'wb') as f:
+            await f.write(data)
+        await asyncio.to_thread(self._replace, tmp_path, path, entity_id)
+
+    def _replace(self, tmp_path: str, path: str, entity_id: int):
+        os.replace(tmp_path, path)
+        for old_path in glob.glob(os.path.join(self.directory, f"{entity_id}_*.jpg")):
+            if old_path != path:
+                try:
+                    os.remove(old_path)
+                except OSError:
+                    pass
+
+    async def get_or_fetch(
+        self,
+        entity_id: int,
+        photo_id: int,
+        fetch: Callable[[], Awaitable[Optional[bytes]]]
+    ) -> Optional[bytes]:
+        """Cached bytes, or fetch once and store; concurrent misses share one fetch"""
+        data = await self.get(entity_id, photo_id)
+        cache_result("avatars", "miss" if data is None else "hit")
+        if data is not None:
+            return data
+
+        return await single_flight(
+            self._inflight,
+            self._key(entity_id, photo_id),
+            lambda: self._fetch(entity_id, photo_id, fetch)
+        )
+
+    async def _fetch(
+        self,
+        entity_id: int,
+        photo_id: int,
+        fetch: Callable[[], Awaitable[Optional[bytes]]]
+    ) -> Optional[bytes]:
+        data = await fetch()
+        if data:
+            await self.put(entity_id, photo_id, data)
+        return data
@@ -0,0 +1,223 @@
+from typing import Dict, Tuple
+import asyncio
+import time
+
+from telethon import TelegramClient
+
+from app.config import get_settings
+from app.telegram_client import TelegramManager, telegram_manager
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS backfill_sessions (
+    session_id TEXT PRIMARY KEY,
+    enabled INTEGER NOT NULL
+);
+-- Checkpoint per chat: the next batch starts below offset_id (0 = newest)
+CREATE TABLE IF NOT EXISTS backfill_state (
+    session_id TEXT NOT NULL,
+    chat_id INTEGER NOT NULL,
+    offset_id INTEGER NOT NULL,
+    fetched INTEGER NOT NULL,
+    done INTEGER NOT NULL,
+    PRIMARY KEY (session_id, chat_id)
+);
+"""
+
+
+class BackfillPaused(Exception):
+    """The session's client went away; backfill resumes from its checkpoint later"""
+
+
+class BackfillWorker:
+    """Walks every dialog's history in the background and feeds the message store"""
+
+    def __init__(self, manager: TelegramManager):
+        self.manager = manager
+        self.store = manager.message_store
+        self.db = self.store.db
+        self.db.conn.executescript(SCHEMA)
+        settings = get_settings()
+        self.batch_size = settings.backfill_batch_size
+        self.interval = 1 / settings.backfill_rate
+        self.idle_delay = settings.backfill_idle_delay
+        self.tasks: Dict[str, asyncio.Task] = {}
+        # session_id -> runtime state (state, chats_total, current_chat_id, error)
+        self.status: Dict[str, dict] = {}
+        manager.client_listeners.append(self._on_client_ready)
+
+    async def start(self, session_id: str) -> dict:
+        """Enable backfill for a session and start it if it isn't running"""
+        await self.db.execute(
+            "INSERT INTO backfill_sessions (session_id, enabled) VALUES (?, 1) "
+            "ON CONFLICT (session_id) DO UPDATE SET enabled = 1",
+            (session_id,)
+        )
+        self._spawn(session_id)
+        return await self.get_status(session_id)
+
+    async def stop(self, session_id: str) -> dict:
+        """Disable backfill for a session, keeping its checkpoints"""
+        await self.db.execute(
+            "UPDATE backfill_sessions SET enabled = 0 WHERE session_id = ?", (session_id,)
+        )
+        await self._cancel(session_id)
+        self._set(session_id, state="stopped", current_chat_id=None)
+        return await self.get_status(session_id)
+
+    async def forget(self, session_id: str):
+        """Stop backfill and drop its checkpoints (on logout)"""
+        await self._cancel(session_id)
+        self.status.pop(session_id, None)
+        await self.db.run(self._delete_session, session_id)
+
+    @staticmethod
+    def _delete_session(conn, session_id: str):
+        conn.execute("DELETE FROM backfill_sessions WHERE session_id = ?", (session_id,))
+        conn.execute("DELETE FROM backfill_state WHERE session_id = ?", (session_id,))
+
+    def _on_client_ready(self, session_id: str):
+        """Continue a backfill that paused when its client was evicted"""
+        if self.status.get(session_id, {}).get("state") == "paused":
+            self._spawn(session_id)
+
+    async def resume(self):
+        """Restart backfill for sessions that had it enabled before a restart"""
+        rows = await self.db.run(
+            lambda conn: conn.execute(
+                "SELECT session_id FROM backfill_sessions WHERE enabled = 1"
+            ).fetchall()
+        )
+        for (session_id,) in rows:
+            if session_id in self.manager.session_strings:
+                self._spawn(session_id)
+
+    async def shutdown(self):
+        """Cancel running backfills without disabling them"""
+        for session_id in list(self.tasks):
+            await self._cancel(session_id)
+
+    async def get_status(self, session_id: str) -> dict:
+        """Progress of a session's backfill"""
+        enabled, chats_done, fetched = await self.db.run(self._progress, session_id)
+        status = {
+            "state": "pending" if enabled else "stopped",
+            "chats_total": None,
+            "current_chat_id": None,
+            "error": None,
+        }
+        status.update(self.status.get(session_id, {}))
+        status.update({
+            "enabled": bool(enabled),
+            "chats_done": chats_done,
+            "messages_fetched": fetched,
+        })
+        return status
+
+    @staticmethod
+    def _progress(conn, session_id: str) -> Tuple[int, int, int]:
+        row = conn.execute(
+            "SELECT enabled FROM backfill_sessions WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        chats_done, fetched = conn.execute(
+            "SELECT COALESCE(SUM(done), 0), COALESCE(SUM(fetched), 0) "
+            "FROM backfill_state WHERE session_id = ?",
+            (session_id,)
+        ).fetchone()
+        return (row[0] if row else 0), chats_done, fetched
+
+    def _set(self, session_id: str, **fields):
+        self.status.setdefault(session_id, {}).update(fields)
+
+    def _spawn(self, session_id: str):
+        task = self.tasks.get(session_id)
+        if task and not task.done():
+            return
+        self.tasks[session_id] = asyncio.create_task(self._run(session_id))
+
+    async def _cancel(self, session_id: str):
+        task = self.tasks.pop(session_id, None)
+        if task and not task.done():
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    async def _run(self, session_id: str):
+        self._set(session_id, state="running", error=None)
+        try:
+            client = await self.manager.get_client_or_restore(session_id)
+            if not client:
+                self._set(session_id, state="error", error="Session not found")
+                return
+
+            await self._wait_for_turn(session_id)
+            dialogs = await self.manager.get_scheduler(session_id).run(
+                lambda: client.get_dialogs(limit=None), background=True
+            )
+            self._set(session_id, chats_total=len(dialogs))
+            for dialog in dialogs:
+                self._set(session_id, current_chat_id=dialog.id)
+                await self._backfill_chat(session_id, dialog.id)
+            self._set(session_id, state="completed", current_chat_id=None)
+        except BackfillPaused:
+            self._set(session_id, state="paused", error="Client disconnected")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Backfill error for {session_id}: {e}")
+            self._set(session_id, state="error", error=str(e))
+
+    async def _backfill_chat(self, session_id: str, chat_id: int):
+        """Fetch a chat's history batch by batch, oldest last, saving a checkpoint each time"""
+        offset_id, fetched, done = await self.db.run(self._load_checkpoint, session_id, chat_id)
+        while not done:
+            client = await self._wait_for_turn(session_id)
+            started = time.monotonic()
+
+            messages = await self.manager.get_scheduler(session_id).run(
+                lambda: self._fetch_batch(client, chat_id, offset_id), background=True
+            )
+            formatted = self.manager.format_messages(messages)
+            await self.store.save_page(session_id, chat_id, formatted, offset_id, self.batch_size)
+
+            fetched += len(messages)
+            done = len(messages) < self.batch_size
+            if messages:
+                offset_id = messages[-1].id
+            await self.db.execute(
+                "INSERT OR REPLACE INTO backfill_state (session_id, chat_id, offset_id, fetched, done) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (session_id, chat_id, offset_id, fetched, int(done))
+            )
+
+            # Strict budget: at most one batch per interval, on top of the scheduler's limits
+            await asyncio.sleep(max(0.0, self.interval - (time.monotonic() - started)))
+
+    async def _fetch_batch(self, client: TelegramClient, chat_id: int, offset_id: int) -> list:
+        return [m async for m in client.iter_messages(chat_id, limit=self.batch_size, offset_id=offset_id)]
+
+    @staticmethod
+    def _load_checkpoint(conn, session_id: str, chat_id: int) -> Tuple[int, int, bool]:
+        row = conn.execute(
+            "SELECT offset_id, fetched, done FROM backfill_state WHERE session_id = ? AND chat_id = ?",
+            (session_id, chat_id)
+        ).fetchone()
+        if row is None:
+            return 0, 0, False
+        return row[0], row[1], bool(row[2])
+
+    async def _wait_for_turn(self, session_id: str) -> TelegramClient:
+        """Wait until the session has been idle for a while and nothing interactive is queued"""
+        while True:
+            client = self.manager.clients.get(session_id)
+            if client is None:
+                raise BackfillPaused()
+            idle = self.manager.idle_seconds(session_id)
+            if idle >= self.idle_delay and not self.manager.get_scheduler(session_id).busy:
+                return client
+            await asyncio.sleep(max(self.idle_delay - idle, 0.5))
+
+
+# Global instance
+backfill_worker = BackfillWorker(telegram_manager)
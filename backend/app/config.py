@@ -10,6 +10,56 @@ class Settings(BaseSettings):
     telegram_api_id: int = int(os.getenv("TELEGRAM_API_ID", "0"))
     telegram_api_hash: str = os.getenv("TELEGRAM_API_HASH", "")
     secret_key: str = os.getenv("SECRET_KEY", "change-this-secret-key")
+    # Session persistence backend: "sqlite" (default) or "json" (legacy sessions.json)
+    session_store: str = os.getenv("SESSION_STORE", "sqlite")
+    session_db_path: str = os.getenv("SESSION_DB_PATH", "sessions.db")
+    # Seconds a failed session restore is cached before it is retried
+    restore_failure_ttl: float = float(os.getenv("RESTORE_FAILURE_TTL", "30"))
+    # Connected client limits: LRU cap, idle TTL and TTL for unfinished logins (seconds)
+    max_clients: int = int(os.getenv("MAX_CLIENTS", "1000"))
+    client_idle_ttl: float = float(os.getenv("CLIENT_IDLE_TTL", "1800"))
+    pending_login_ttl: float = float(os.getenv("PENDING_LOGIN_TTL", "600"))
+    eviction_interval: float = float(os.getenv("EVICTION_INTERVAL", "60"))
+    # Profile photo cache: directory on disk and in-memory LRU budget (bytes)
+    avatar_cache_dir: str = os.getenv("AVATAR_CACHE_DIR", "avatars")
+    avatar_memory_cache_bytes: int = int(os.getenv("AVATAR_MEMORY_CACHE_BYTES", str(32 * 1024 * 1024)))
+    # Seconds a remembered entity's photo info is trusted before get_entity refreshes it
+    avatar_entity_ttl: float = float(os.getenv("AVATAR_ENTITY_TTL", "600"))
+    # Downloaded media cache: directory and byte budget before LRU eviction
+    media_cache_dir: str = os.getenv("MEDIA_CACHE_DIR", "downloads")
+    media_cache_max_bytes: int = int(os.getenv("MEDIA_CACHE_MAX_BYTES", str(2 * 1024 * 1024 * 1024)))
+    # Local message history store (SQLite)
+    message_db_path: str = os.getenv("MESSAGE_DB_PATH", "messages.db")
+    # History backfill: messages per request, requests/second, and how long a
+    # session must be idle (seconds) before background requests resume
+    backfill_batch_size: int = int(os.getenv("BACKFILL_BATCH_SIZE", "100"))
+    backfill_rate: float = float(os.getenv("BACKFILL_RATE", "1"))
+    backfill_idle_delay: float = float(os.getenv("BACKFILL_IDLE_DELAY", "5"))
+    # Per-client RPC scheduler: starting requests/second, burst size, parallel requests.
+    # The rate grows by RPC_RATE_STEP per successful request up to RPC_MAX_RATE and
+    # halves on every FloodWait, down to RPC_MIN_RATE.
+    rpc_rate: float = float(os.getenv("RPC_RATE", "30"))
+    rpc_min_rate: float = float(os.getenv("RPC_MIN_RATE", "1"))
+    rpc_max_rate: float = float(os.getenv("RPC_MAX_RATE", "60"))
+    rpc_rate_step: float = float(os.getenv("RPC_RATE_STEP", "0.5"))
+    rpc_burst: int = int(os.getenv("RPC_BURST", "30"))
+    rpc_concurrency: int = int(os.getenv("RPC_CONCURRENCY", "8"))
+    rpc_flood_retries: int = int(os.getenv("RPC_FLOOD_RETRIES", "3"))
+    # Per-WebSocket outbound queue length and what to do when it is full:
+    # "drop_oldest", "coalesce" (replace superseded state, else drop oldest) or "disconnect"
+    ws_queue_size: int = int(os.getenv("WS_QUEUE_SIZE", "256"))
+    ws_overflow_policy: str = os.getenv("WS_OVERFLOW_POLICY", "coalesce")
+    # Seconds presence/typing/edit updates are merged before being sent as one batch (0 = off)
+    ws_coalesce_window: float = float(os.getenv("WS_COALESCE_WINDOW", "0.25"))
+    # Sequenced events kept per session so a reconnect with ?last_seq= can replay what it missed
+    ws_replay_buffer: int = int(os.getenv("WS_REPLAY_BUFFER", "1000"))
+    # Seconds a session keeps its update subscription and replay buffer after its last socket closes
+    ws_resume_grace: float = float(os.getenv("WS_RESUME_GRACE", "60"))
+    # Reconnect every saved session in the background at startup
+    warmup_on_startup: bool = os.getenv("WARMUP_ON_STARTUP", "false").lower() in ("1", "true", "yes")
+    warmup_concurrency: int = int(os.getenv("WARMUP_CONCURRENCY", "10"))
+    # Fraction of saved sessions that must be processed before /health reports ready
+    warmup_ready_threshold: float = float(os.getenv("WARMUP_READY_THRESHOLD", "0.9"))
 
     class Config:
         env_file = ".env"
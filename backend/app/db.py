@@ -0,0 +1,32 @@
+import asyncio
+import sqlite3
+import threading
+from typing import Any, Callable
+
+
+class SQLiteDatabase:
+    """Thin wrapper around a SQLite connection that runs queries off the event loop"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self._lock = threading.Lock()
+
+    def call(self, fn: Callable[..., Any], *args) -> Any:
+        """Run fn(conn, *args) synchronously while holding the connection lock"""
+        with self._lock:
+            return fn(self.conn, *args)
+
+    async def run(self, fn: Callable[..., Any], *args) -> Any:
+        """Run fn(conn, *args) in a worker thread"""
+        return await asyncio.to_thread(self.call, fn, *args)
+
+    async def execute(self, sql: str, params: tuple = ()):
+        """Execute a single statement in a worker thread"""
+        return await self.run(lambda conn: conn.execute(sql, params))
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
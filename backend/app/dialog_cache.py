@@ -0,0 +1,122 @@
+from typing import Dict, List, Optional
+import uuid
+
+
+class DialogCache:
+    """Formatted dialog list of one session, kept current by update events"""
+
+    def __init__(self):
+        self.dialogs: Dict[int, dict] = {}  # chat_id -> formatted dialog
+        self.order: List[int] = []  # chat_ids in display order
+        self.limit = 0  # limit of the last full fetch
+        self.complete = False  # the last fetch returned every dialog
+        self.warm = False
+        # Versions for delta sync: tokens look like "<epoch>:<version>", the
+        # epoch changes per cache instance so tokens never survive a restart
+        self.epoch = uuid.uuid4().hex[:8]
+        self.version = 0
+        self.base_version = 0  # version of the last full fetch
+        self.changed: Dict[int, int] = {}  # chat_id -> version of last change
+
+    def fill(self, dialogs: List[dict], limit: int):
+        """Replace the cache with a freshly fetched dialog list"""
+        self.dialogs = {d["id"]: d for d in dialogs}
+        self.order = [d["id"] for d in dialogs]
+        self.limit = limit
+        self.complete = len(dialogs) < limit
+        self.warm = True
+        self.version += 1
+        self.base_version = self.version
+        self.changed = {chat_id: self.version for chat_id in self.order}
+
+    def get(self, limit: int) -> Optional[List[dict]]:
+        """Return the first `limit` dialogs, or None if the cache can't answer"""
+        if not self.warm or (limit > self.limit and not self.complete):
+            return None
+        return [self.dialogs[chat_id] for chat_id in self.order[:limit]]
+
+    @property
+    def token(self) -> str:
+        """Version token to hand to clients for delta sync"""
+        return f"{self.epoch}:{self.version}"
+
+    def changes_since(self, token: str) -> Optional[List[dict]]:
+        """Dialogs changed after `token`, or None if a full reload is needed"""
+        try:
+            epoch, version = token.split(":", 1)
+            version = int(version)
+        except ValueError:
+            return None
+        if not self.warm or epoch != self.epoch or version < self.base_version:
+            return None
+        return [
+            self.dialogs[chat_id] for chat_id in self.order
+            if self.changed.get(chat_id, 0) > version
+        ]
+
+    def _bump(self, chat_id: int):
+        self.version += 1
+        self.changed[chat_id] = self.version
+
+    def invalidate(self):
+        """Force the next read to refetch from Telegram"""
+        self.warm = False
+
+    def _move_to_top(self, chat_id: int):
+        """Move a dialog right below the pinned ones"""
+        if self.dialogs[chat_id].get("is_pinned"):
+            return
+        self.order.remove(chat_id)
+        index = 0
+        while index < len(self.order) and self.dialogs[self.order[index]].get("is_pinned"):
+            index += 1
+        self.order.insert(index, chat_id)
+
+    def apply_new_message(self, chat_id: int, message_id: int, date: Optional[str], preview: str, outgoing: bool):
+        """Bump last message, unread count and ordering for a new message"""
+        if not self.warm:
+            return
+        dialog = self.dialogs.get(chat_id)
+        if dialog is None:
+            # Dialog outside the cached window (or brand new): we can't format it here
+            self.invalidate()
+            return
+        dialog["last_message"] = preview
+        dialog["last_message_date"] = date
+        dialog["last_message_id"] = message_id
+        if not outgoing:
+            dialog["unread_count"] = (dialog.get("unread_count") or 0) + 1
+        self._move_to_top(chat_id)
+        self._bump(chat_id)
+
+    def apply_edit(self, chat_id: int, message_id: int, preview: str):
+        """Refresh the preview if the edited message is the last one"""
+        dialog = self.dialogs.get(chat_id)
+        if dialog is not None and dialog.get("last_message_id") == message_id:
+            dialog["last_message"] = preview
+            self._bump(chat_id)
+
+    def apply_delete(self, chat_id: Optional[int], message_ids: List[int]):
+        """Invalidate if a dialog's last message was deleted"""
+        deleted = set(message_ids)
+        if chat_id is not None:
+            candidates = [self.dialogs[chat_id]] if chat_id in self.dialogs else []
+        else:
+            # Deletions outside channels don't carry a chat_id
+            candidates = self.dialogs.values()
+        if any(d.get("last_message_id") in deleted for d in candidates):
+            self.invalidate()
+
+    def apply_read(self, chat_id: int, max_id: Optional[int] = None):
+        """Reset the unread counter after a read acknowledgement up to max_id"""
+        dialog = self.dialogs.get(chat_id)
+        if dialog is None:
+            return
+        last_id = dialog.get("last_message_id")
+        if max_id is None or last_id is None or max_id >= last_id:
+            if dialog.get("unread_count"):
+                dialog["unread_count"] = 0
+                self._bump(chat_id)
+        else:
+            # Only part of the chat was read, the exact count is unknown
+            self.invalidate()
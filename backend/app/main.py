@@ -1,23 +1,42 @@
 from fastapi import FastAPI, WebSocket, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response
 from fastapi.staticfiles import StaticFiles
 from contextlib import asynccontextmanager
+from typing import Optional
+import asyncio
 import os
 
+from app.config import get_settings
 from app.telegram_client import telegram_manager
 from app.websocket import websocket_endpoint
-from app.routes import auth, chats, messages, media
+from app.backfill import backfill_worker
+from app.metrics import MetricsMiddleware, render as render_metrics
+from app.routes import auth, chats, messages, media, backfill
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     print("Starting Telegram Clone Backend...")
-    os.makedirs("uploads", exist_ok=True)
     os.makedirs("downloads", exist_ok=True)
+    settings = get_settings()
+    eviction_task = asyncio.create_task(
+        telegram_manager.run_eviction_loop(settings.eviction_interval)
+    )
+    warmup_task = None
+    if settings.warmup_on_startup:
+        warmup_task = asyncio.create_task(
+            telegram_manager.warm_up(settings.warmup_concurrency)
+        )
+    await backfill_worker.resume()
     yield
     # Shutdown
     print("Shutting down...")
+    eviction_task.cancel()
+    if warmup_task and not warmup_task.done():
+        warmup_task.cancel()
+    await backfill_worker.shutdown()
     await telegram_manager.disconnect_all()
 
 
@@ -37,28 +56,51 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-route latency histograms
+app.add_middleware(MetricsMiddleware)
+
 # Include routers
 app.include_router(auth.router, prefix="/api/auth")
 app.include_router(chats.router, prefix="/api/chats")
 app.include_router(messages.router, prefix="/api/messages")
 app.include_router(media.router, prefix="/api/media")
+app.include_router(backfill.router, prefix="/api/backfill")
 
 
 # WebSocket endpoint
 @app.websocket("/ws")
 async def websocket_route(
     websocket: WebSocket,
-    session_id: str = Query(...)
+    session_id: str = Query(...),
+    encoding: str = Query("json", description="Frame encoding: json or msgpack"),
+    last_seq: Optional[int] = Query(None, description="Last event seq received, to replay missed events")
 ):
     """WebSocket endpoint for real-time updates"""
-    await websocket_endpoint(websocket, session_id)
+    await websocket_endpoint(websocket, session_id, encoding, last_seq)
 
 
 # Health check
 @app.get("/health")
 async def health_check():
-    """Health check endpoint"""
-    return {"status": "healthy", "service": "telegram-clone-backend"}
+    """Health check endpoint, returns 503 until session warm-up is ready"""
+    ready = telegram_manager.warmup_ready(get_settings().warmup_ready_threshold)
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "status": "healthy" if ready else "warming_up",
+            "service": "telegram-clone-backend",
+            "ready": ready,
+            "warmup": telegram_manager.warmup_status,
+        }
+    )
+
+
+# Prometheus metrics
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics: route and RPC latency, FloodWaits, clients, cache hits"""
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
 
 
 # Root endpoint
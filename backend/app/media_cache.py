@@ -0,0 +1,141 @@
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional
+import asyncio
+import os
+import time
+
+from app.metrics import cache_result
+from app.scheduler import single_flight
+
+# Seconds a file handed out by the cache is safe from eviction, so the response
+# serving it gets to open it (once open, removing it no longer matters)
+LEASE_SECONDS = 30
+
+
+class MediaCache:
+    """Downloaded media on disk, one file per Telegram media, evicted LRU over a byte budget"""
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, int]" = OrderedDict()  # file name -> size, LRU first
+        self._total = 0
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._leases: Dict[str, float] = {}  # file name -> monotonic time it was handed out
+        os.makedirs(directory, exist_ok=True)
+        self._scan()
+
+    def _scan(self):
+        """Index files left by a previous run, least recently used first"""
+        files = []
+        for entry in os.scandir(self.directory):
+            if not entry.is_file():
+                continue
+            if entry.name.endswith(".part"):
+                # Interrupted download
+                os.remove(entry.path)
+                continue
+            stat = entry.stat()
+            # lookup() touches files, so mtime is the last use
+            files.append((stat.st_mtime, entry.name, stat.st_size))
+        for _, name, size in sorted(files):
+            self._entries[name] = size
+            self._total += size
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    async def lookup(self, name: str) -> Optional[str]:
+        """Path of a cached file, marking it recently used"""
+        if name not in self._entries:
+            return None
+        path = self.path(name)
+        if not await asyncio.to_thread(self._touch, path):
+            if name in self._entries:
+                self._total -= self._entries.pop(name)
+            return None
+        if name in self._entries:
+            self._entries.move_to_end(name)
+        self._leases[name] = time.monotonic()
+        return path
+
+    @staticmethod
+    def _touch(path: str) -> bool:
+        try:
+            os.utime(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    async def _add(self, name: str, size: int):
+        if name in self._entries:
+            self._total -= self._entries.pop(name)
+        self._entries[name] = size
+        self._total += size
+        self._leases[name] = time.monotonic()
+        await self._evict()
+
+    async def _evict(self):
+        """Delete least recently used files until the cache fits its budget.
+
+        Files handed out within LEASE_SECONDS are skipped, so a response
+        never finds the file it was just given deleted.
+        """
+        now = time.monotonic()
+        for name, leased_at in list(self._leases.items()):
+            if now - leased_at >= LEASE_SECONDS:
+                del self._leases[name]
+
+        victims = []
+        for name in list(self._entries):
+            if self._total <= self.max_bytes:
+                break
+            if name in self._leases:
+                continue
+            self._total -= self._entries.pop(name)
+            victims.append(self.path(name))
+        if victims:
+            await asyncio.to_thread(self._remove, victims)
+
+    @staticmethod
+    def _remove(paths):
+        for path in paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    @staticmethod
+    def _commit(written: str, path: str) -> int:
+        """Move a finished download into place, returning its size"""
+        os.replace(written, path)
+        return os.path.getsize(path)
+
+    async def get_or_download(
+        self,
+        name: str,
+        download: Callable[[str], Awaitable[Optional[str]]]
+    ) -> Optional[str]:
+        """Cached path, or download(tmp_path) once; concurrent misses share the download"""
+        path = await self.lookup(name)
+        cache_result("media", "hit" if path else "miss")
+        if path:
+            return path
+
+        return await single_flight(self._inflight, name, lambda: self._download(name, download))
+
+    async def _download(
+        self,
+        name: str,
+        download: Callable[[str], Awaitable[Optional[str]]]
+    ) -> Optional[str]:
+        tmp_path = self.path(name) + ".part"
+        try:
+            written = await download(tmp_path)
+            if not written:
+                return None
+            path = self.path(name)
+            await self._add(name, await asyncio.to_thread(self._commit, written, path))
+            return path
+        finally:
+            await asyncio.to_thread(self._remove, [tmp_path])
@@ -0,0 +1,295 @@
+from typing import List, Optional, Set, Tuple
+import json
+import re
+import sqlite3
+
+from app.db import SQLiteDatabase
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    session_id TEXT NOT NULL,
+    chat_id INTEGER NOT NULL,
+    id INTEGER NOT NULL,
+    date TEXT,
+    data TEXT NOT NULL,
+    PRIMARY KEY (session_id, chat_id, id)
+);
+CREATE INDEX IF NOT EXISTS messages_by_id ON messages (session_id, id);
+-- [low, high]: every message of the chat with low <= id <= high is stored.
+-- low = 0 means the range reaches the start of the chat history.
+CREATE TABLE IF NOT EXISTS ranges (
+    session_id TEXT NOT NULL,
+    chat_id INTEGER NOT NULL,
+    low INTEGER NOT NULL,
+    high INTEGER NOT NULL,
+    PRIMARY KEY (session_id, chat_id, low)
+);
+"""
+
+# Full-text index over message text, keyed by the messages rowid and kept in
+# sync by triggers (writes must upsert, not REPLACE, so rowids stay stable)
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE messages_fts USING fts5(text, tokenize = 'unicode61 remove_diacritics 2');
+CREATE TRIGGER messages_fts_insert AFTER INSERT ON messages BEGIN
+    INSERT INTO messages_fts (rowid, text) VALUES (new.rowid, json_extract(new.data, '$.text'));
+END;
+CREATE TRIGGER messages_fts_delete AFTER DELETE ON messages BEGIN
+    DELETE FROM messages_fts WHERE rowid = old.rowid;
+END;
+CREATE TRIGGER messages_fts_update AFTER UPDATE OF data ON messages BEGIN
+    UPDATE messages_fts SET text = json_extract(new.data, '$.text') WHERE rowid = new.rowid;
+END;
+INSERT INTO messages_fts (rowid, text) SELECT rowid, json_extract(data, '$.text') FROM messages;
+"""
+
+# v1: stored messages match the Message schema exactly ("Z" dates, media_url present)
+SCHEMA_V1 = """
+UPDATE messages SET
+    date = replace(date, '+00:00', 'Z'),
+    data = json_set(data, '$.date', replace(json_extract(data, '$.date'), '+00:00', 'Z'), '$.media_url', NULL);
+PRAGMA user_version = 1;
+"""
+
+# (messages, gap) where gap is (offset_id, limit) still to fetch from Telegram
+Page = Tuple[List[dict], Optional[Tuple[int, int]]]
+
+
+class SearchQueryError(Exception):
+    """The full-text index rejected a search query"""
+
+
+class MessageStore:
+    """Local copy of formatted messages per session, with known-contiguous id ranges per chat"""
+
+    def __init__(self, path: str):
+        self.db = SQLiteDatabase(path)
+        self.db.conn.executescript(SCHEMA)
+        has_fts = self.db.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'messages_fts'"
+        ).fetchone()
+        if not has_fts:
+            self.db.conn.executescript(f"BEGIN; {FTS_SCHEMA} COMMIT;")
+        if self.db.conn.execute("PRAGMA user_version").fetchone()[0] < 1:
+            self.db.conn.executescript(f"BEGIN; {SCHEMA_V1} COMMIT;")
+        # (session_id, chat_id) whose newest range is kept current by live updates
+        self._live_heads: Set[Tuple[str, int]] = set()
+
+    def reset_heads(self, session_id: str):
+        """The session stopped receiving updates; its newest ranges may now be stale"""
+        self._live_heads = {key for key in self._live_heads if key[0] != session_id}
+
+    def is_head_live(self, session_id: str, chat_id: int) -> bool:
+        return (session_id, chat_id) in self._live_heads
+
+    # Reads
+    async def get_page(self, session_id: str, chat_id: int, limit: int, offset_id: int) -> Optional[Page]:
+        """Serve a page of messages older than offset_id (newest if 0) from the store.
+
+        Returns None if the start of the page isn't covered by a known range,
+        otherwise the stored messages plus the gap still missing, if any.
+        """
+        head_live = self.is_head_live(session_id, chat_id)
+        return await self.db.run(self._get_page, session_id, chat_id, limit, offset_id, head_live)
+
+    @staticmethod
+    def _get_page(conn, session_id: str, chat_id: int, limit: int, offset_id: int, head_live: bool) -> Optional[Page]:
+        if offset_id == 0:
+            if not head_live:
+                return None
+            row = conn.execute(
+                "SELECT low, high FROM ranges WHERE session_id = ? AND chat_id = ? "
+                "ORDER BY high DESC LIMIT 1",
+                (session_id, chat_id)
+            ).fetchone()
+            if row is None:
+                return None
+            low, upper = row
+        else:
+            upper = offset_id - 1
+            row = conn.execute(
+                "SELECT low FROM ranges WHERE session_id = ? AND chat_id = ? "
+                "AND low <= ? AND high >= ?",
+                (session_id, chat_id, upper, upper)
+            ).fetchone()
+            if row is None:
+                return None
+            low = row[0]
+
+        rows = conn.execute(
+            "SELECT id, data FROM messages WHERE session_id = ? AND chat_id = ? "
+            "AND id BETWEEN ? AND ? ORDER BY id DESC LIMIT ?",
+            (session_id, chat_id, low, upper, limit)
+        ).fetchall()
+        messages = [json.loads(data) for _, data in rows]
+
+        if len(rows) == limit or low == 0:
+            return messages, None
+        gap_offset = rows[-1][0] if rows else upper + 1
+        return messages, (gap_offset, limit - len(rows))
+
+    @staticmethod
+    def _match_query(query: str) -> Optional[str]:
+        """Turn free text into an FTS5 query: every word must match as a prefix"""
+        words = re.findall(r"\w+", query)
+        if not words:
+            return None
+        return " ".join(f'"{word}"*' for word in words)
+
+    async def search(
+        self,
+        session_id: str,
+        query: str,
+        chat_id: Optional[int] = None,
+        limit: int = 50,
+        offset: int = 0
+    ) -> List[dict]:
+        """Search stored messages of a session (optionally one chat), best matches first"""
+        match = self._match_query(query)
+        if match is None:
+            return []
+        try:
+            return await self.db.run(self._search, session_id, match, chat_id, limit, offset)
+        except sqlite3.OperationalError as e:
+            # SQLITE_ERROR here comes from the MATCH expression (busy/locked have their own codes)
+            if e.sqlite_errorcode == sqlite3.SQLITE_ERROR:
+                raise SearchQueryError(str(e)) from e
+            raise
+
+    @staticmethod
+    def _search(conn, session_id: str, match: str, chat_id: Optional[int], limit: int, offset: int) -> List[dict]:
+        sql = (
+            "SELECT m.data FROM messages_fts JOIN messages m ON m.rowid = messages_fts.rowid "
+            "WHERE messages_fts MATCH ? AND m.session_id = ?"
+        )
+        params = [match, session_id]
+        if chat_id is not None:
+            sql += " AND m.chat_id = ?"
+            params.append(chat_id)
+        sql += " ORDER BY bm25(messages_fts), m.date DESC LIMIT ? OFFSET ?"
+        params += [limit, offset]
+        return [json.loads(data) for (data,) in conn.execute(sql, params)]
+
+    # Writes
+    async def save_page(self, session_id: str, chat_id: int, messages: List[dict], offset_id: int, limit: int):
+        """Store a page fetched from Telegram and record the id range it covers"""
+        if offset_id == 0:
+            if not messages:
+                return
+            self._live_heads.add((session_id, chat_id))
+        await self.db.run(self._save_page, session_id, chat_id, messages, offset_id, limit)
+
+    @staticmethod
+    def _save_page(conn, session_id: str, chat_id: int, messages: List[dict], offset_id: int, limit: int):
+        ids = [m["id"] for m in messages]
+        high = offset_id - 1 if offset_id else max(ids)
+        # A short page means we reached the beginning of the chat
+        low = min(ids) if ids and len(messages) >= limit else 0
+
+        conn.execute("BEGIN")
+        try:
+            MessageStore._insert(conn, session_id, chat_id, messages)
+            MessageStore._add_range(conn, session_id, chat_id, low, high)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    @staticmethod
+    def _insert(conn, session_id: str, chat_id: int, messages: List[dict]):
+        conn.executemany(
+            "INSERT INTO messages (session_id, chat_id, id, date, data) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT (session_id, chat_id, id) DO UPDATE SET date = excluded.date, data = excluded.data",
+            [(session_id, chat_id, m["id"], m.get("date"), json.dumps(m)) for m in messages]
+        )
+
+    @staticmethod
+    def _add_range(conn, session_id: str, chat_id: int, low: int, high: int):
+        """Merge [low, high] with every overlapping or adjacent range"""
+        rows = conn.execute(
+            "SELECT low, high FROM ranges WHERE session_id = ? AND chat_id = ? "
+            "AND low <= ? AND high >= ?",
+            (session_id, chat_id, high + 1, low - 1)
+        ).fetchall()
+        for row_low, row_high in rows:
+            low, high = min(low, row_low), max(high, row_high)
+        conn.execute(
+            "DELETE FROM ranges WHERE session_id = ? AND chat_id = ? AND low <= ? AND high >= ?",
+            (session_id, chat_id, high, low)
+        )
+        conn.execute(
+            "INSERT INTO ranges (session_id, chat_id, low, high) VALUES (?, ?, ?, ?)",
+            (session_id, chat_id, low, high)
+        )
+
+    async def add_new_message(self, session_id: str, chat_id: int, message: dict):
+        """Store a live message, extending the newest range if it is kept current"""
+        head_live = self.is_head_live(session_id, chat_id)
+        await self.db.run(self._add_new_message, session_id, chat_id, message, head_live)
+
+    @staticmethod
+    def _add_new_message(conn, session_id: str, chat_id: int, message: dict, head_live: bool):
+        conn.execute("BEGIN")
+        try:
+            MessageStore._insert(conn, session_id, chat_id, [message])
+            if head_live:
+                conn.execute(
+                    "UPDATE ranges SET high = max(high, ?) WHERE session_id = ? AND chat_id = ? "
+                    "AND high = (SELECT max(high) FROM ranges WHERE session_id = ? AND chat_id = ?)",
+                    (message["id"], session_id, chat_id, session_id, chat_id)
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    async def add_messages(self, session_id: str, messages: List[dict]):
+        """Store (and index) messages outside of any known range, e.g. search results"""
+        await self.db.run(self._add_messages, session_id, messages)
+
+    @staticmethod
+    def _add_messages(conn, session_id: str, messages: List[dict]):
+        conn.execute("BEGIN")
+        try:
+            for message in messages:
+                MessageStore._insert(conn, session_id, message["chat_id"], [message])
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    async def update_message(self, session_id: str, chat_id: int, message: dict):
+        """Replace a stored message after an edit (no-op if it isn't stored)"""
+        await self.db.execute(
+            "UPDATE messages SET data = ?, date = ? WHERE session_id = ? AND chat_id = ? AND id = ?",
+            (json.dumps(message), message.get("date"), session_id, chat_id, message["id"])
+        )
+
+    async def delete_messages(self, session_id: str, chat_id: Optional[int], message_ids: List[int]):
+        """Remove deleted messages; without chat_id (non-channel deletes) match by id only"""
+        await self.db.run(self._delete_messages, session_id, chat_id, message_ids)
+
+    @staticmethod
+    def _delete_messages(conn, session_id: str, chat_id: Optional[int], message_ids: List[int]):
+        if chat_id is not None:
+            conn.executemany(
+                "DELETE FROM messages WHERE session_id = ? AND chat_id = ? AND id = ?",
+                [(session_id, chat_id, message_id) for message_id in message_ids]
+            )
+        else:
+            conn.executemany(
+                "DELETE FROM messages WHERE session_id = ? AND id = ?",
+                [(session_id, message_id) for message_id in message_ids]
+            )
+
+    async def delete_session(self, session_id: str):
+        """Forget everything stored for a session"""
+        self.reset_heads(session_id)
+        await self.db.run(self._delete_session, session_id)
+
+    @staticmethod
+    def _delete_session(conn, session_id: str):
+        conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+        conn.execute("DELETE FROM ranges WHERE session_id = ?", (session_id,))
+
+    def close(self):
+        self.db.close()
@@ -0,0 +1,185 @@
+from typing import Any
+import inspect
+import os
+import time
+
+from prometheus_client import Counter, Gauge, Histogram, CONTENT_TYPE_LATEST, generate_latest
+from telethon.errors import FloodWaitError
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ["method", "route", "status"]
+)
+RPC_SECONDS = Histogram(
+    "telegram_rpc_duration_seconds",
+    "Latency of TelegramClient calls made by the backend",
+    ["rpc"]
+)
+RPC_ERRORS = Counter(
+    "telegram_rpc_errors_total",
+    "Failed TelegramClient calls",
+    ["rpc", "error"]
+)
+FLOOD_WAITS = Counter(
+    "telegram_flood_waits_total",
+    "FloodWait errors raised by Telegram",
+    ["rpc"]
+)
+FLOOD_WAIT_SECONDS = Counter(
+    "telegram_flood_wait_seconds_total",
+    "Seconds Telegram asked us to wait",
+    ["rpc"]
+)
+RPC_BYTES = Counter(
+    "telegram_rpc_bytes_total",
+    "Media bytes transferred to/from Telegram",
+    ["rpc", "direction"]
+)
+LIVE_CLIENTS = Gauge("telegram_clients", "Connected Telegram clients")
+WS_CONNECTIONS = Gauge("websocket_connections", "Open WebSocket connections")
+WS_RESUMES = Counter(
+    "websocket_resumes_total",
+    "Reconnects with last_seq by outcome (replayed, resync)",
+    ["result"]
+)
+CACHE_REQUESTS = Counter(
+    "cache_requests_total",
+    "Cache lookups by cache and result (hit, partial, miss)",
+    ["cache", "result"]
+)
+
+
+def cache_result(cache: str, result: str):
+    """Count a cache lookup"""
+    CACHE_REQUESTS.labels(cache, result).inc()
+
+
+def render():
+    """(body, content type) of the metrics exposition"""
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency per route template (not per raw path)"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            HTTP_REQUEST_SECONDS.labels(
+                scope["method"],
+                getattr(route, "path", "unmatched"),
+                str(status)
+            ).observe(time.perf_counter() - started)
+
+
+def _transferred(rpc: str, args: tuple, kwargs: dict, result: Any):
+    """Record media bytes moved by a call, where they can be known cheaply"""
+    if rpc == "upload_file":
+        size = kwargs.get("file_size")
+        if size:
+            RPC_BYTES.labels(rpc, "out").inc(size)
+    elif rpc == "send_file":
+        file = args[1] if len(args) > 1 else kwargs.get("file")
+        if isinstance(file, str) and os.path.exists(file):
+            RPC_BYTES.labels(rpc, "out").inc(os.path.getsize(file))
+    elif isinstance(result, bytes):
+        RPC_BYTES.labels(rpc, "in").inc(len(result))
+    elif rpc == "download_media" and isinstance(result, str) and os.path.exists(result):
+        RPC_BYTES.labels(rpc, "in").inc(os.path.getsize(result))
+
+
+def _failed(rpc: str, error: Exception):
+    RPC_ERRORS.labels(rpc, type(error).__name__).inc()
+    if isinstance(error, FloodWaitError):
+        FLOOD_WAITS.labels(rpc).inc()
+        FLOOD_WAIT_SECONDS.labels(rpc).inc(error.seconds)
+
+
+class _InstrumentedIter:
+    """Async iterator over a Telethon iter_* call, timed until it is exhausted"""
+
+    def __init__(self, rpc: str, iterator):
+        self.rpc = rpc
+        self.iterator = iterator.__aiter__()
+        self.started = time.perf_counter()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            item = await self.iterator.__anext__()
+        except StopAsyncIteration:
+            RPC_SECONDS.labels(self.rpc).observe(time.perf_counter() - self.started)
+            raise
+        except Exception as e:
+            _failed(self.rpc, e)
+            raise
+        if isinstance(item, bytes):
+            RPC_BYTES.labels(self.rpc, "in").inc(len(item))
+        return item
+
+    async def aclose(self):
+        """Close the wrapped iterator early (Telethon returns borrowed DC senders in close())"""
+        close = getattr(self.iterator, "aclose", None) or getattr(self.iterator, "close", None)
+        if close is not None:
+            await close()
+
+
+class InstrumentedClient:
+    """Proxy around a TelegramClient recording latency, errors, FloodWaits and bytes per call.
+
+    Coroutine methods, raw requests (`client(request)`) and iter_* methods are
+    instrumented; everything else (event handlers, session, ...) passes through.
+    """
+
+    def __init__(self, client):
+        object.__setattr__(self, "_client", client)
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._client, name)
+        if name.startswith("iter_") and callable(attr):
+            return lambda *args, **kwargs: _InstrumentedIter(name, attr(*args, **kwargs))
+        if inspect.iscoroutinefunction(attr):
+            async def call(*args, **kwargs):
+                return await self._observe(name, attr(*args, **kwargs), args, kwargs)
+            return call
+        return attr
+
+    def __setattr__(self, name: str, value):
+        setattr(self._client, name, value)
+
+    async def __call__(self, request, *args, **kwargs):
+        return await self._observe(type(request).__name__, self._client(request, *args, **kwargs), (), {})
+
+    @staticmethod
+    async def _observe(rpc: str, awaitable, args: tuple, kwargs: dict):
+        started = time.perf_counter()
+        try:
+            result = await awaitable
+        except Exception as e:
+            _failed(rpc, e)
+            raise
+        finally:
+            RPC_SECONDS.labels(rpc).observe(time.perf_counter() - started)
+        _transferred(rpc, args, kwargs, result)
+        return result
@@ -45,8 +45,17 @@ class Dialog(BaseModel):
     is_muted: bool = False
 
 
+class DialogOffset(BaseModel):
+    offset_date: Optional[datetime] = None
+    offset_id: int = 0
+    offset_peer: Optional[int] = None
+
+
 class DialogsResponse(BaseModel):
     dialogs: List[Dialog]
+    version: Optional[str] = None  # pass back as `since` for delta sync
+    next_offset: Optional[DialogOffset] = None  # cursor for the next page
+    full: bool = True  # False when `dialogs` only holds changes since a version
 
 
 # Message schemas
@@ -56,11 +65,12 @@ class Message(BaseModel):
     sender_id: Optional[int] = None
     sender_name: Optional[str] = None
     text: Optional[str] = None
-    date: datetime
+    date: Optional[datetime] = None
     is_outgoing: bool = False
     reply_to_msg_id: Optional[int] = None
     media_type: Optional[str] = None  # photo, video, document, voice, sticker
     media_url: Optional[str] = None
+    media_info: Optional[str] = None  # document file name
     is_edited: bool = False
     views: Optional[int] = None
     forwards: Optional[int] = None
@@ -71,6 +81,14 @@ class MessagesResponse(BaseModel):
     chat_id: int
 
 
+class SearchMessagesResponse(BaseModel):
+    messages: List[Message]
+    query: str
+    chat_id: Optional[int] = None
+    source: str  # "local" index or "telegram" fallback
+    next_offset: Optional[int] = None
+
+
 class SendMessageRequest(BaseModel):
     chat_id: int
     text: str
@@ -88,6 +106,11 @@ class DeleteMessageRequest(BaseModel):
     message_ids: List[int]
 
 
+# Media schemas
+class PreviewsRequest(BaseModel):
+    message_ids: List[int]
+
+
 # User schemas
 class User(BaseModel):
     id: int
@@ -1,5 +1,6 @@
 from fastapi import APIRouter, HTTPException
 from app.telegram_client import telegram_manager
+from app.backfill import backfill_worker
 from app.models.schemas import (
     SendCodeRequest,
     SendCodeResponse,
@@ -91,6 +92,8 @@ async def restore_session(request: RestoreSessionRequest):
 async def logout(session_id: str):
     """Logout and cleanup session"""
     try:
+        # Stop backfill first so no batch writes into the store after it is cleared
+        await backfill_worker.forget(session_id)
         await telegram_manager.logout(session_id)
         return {"success": True}
     except Exception as e:
@@ -0,0 +1,38 @@
+from fastapi import APIRouter, HTTPException, Query
+from app.telegram_client import telegram_manager
+from app.backfill import backfill_worker
+
+router = APIRouter(tags=["backfill"])
+
+
+@router.post("/start")
+async def start_backfill(session_id: str = Query(..., description="Session ID")):
+    """Start (or resume) fetching the session's full history in the background"""
+    try:
+        client = await telegram_manager.get_client_or_restore(session_id)
+        if not client:
+            raise HTTPException(status_code=401, detail="Session not found")
+
+        return await backfill_worker.start(session_id)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/stop")
+async def stop_backfill(session_id: str = Query(..., description="Session ID")):
+    """Stop the session's backfill, keeping its progress"""
+    try:
+        return await backfill_worker.stop(session_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/status")
+async def backfill_status(session_id: str = Query(..., description="Session ID")):
+    """Backfill progress of a session"""
+    try:
+        return await backfill_worker.get_status(session_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
@@ -1,9 +1,12 @@
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, Header
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel
 from app.telegram_client import telegram_manager
 from app.models.schemas import DialogsResponse
 from typing import Optional, List
+from datetime import datetime
 import asyncio
+import json
 
 router = APIRouter(tags=["chats"])
 
@@ -15,16 +18,36 @@ class AvatarsRequest(BaseModel):
 @router.get("/dialogs", response_model=DialogsResponse)
 async def get_dialogs(
     session_id: str = Query(..., description="Session ID"),
-    limit: int = Query(300, ge=1, le=500, description="Number of dialogs to fetch")
+    limit: int = Query(300, ge=1, le=500, description="Number of dialogs to fetch"),
+    force: bool = Query(False, description="Bypass the dialog cache and refetch from Telegram"),
+    offset_date: Optional[datetime] = Query(None, description="Cursor: last message date of the previous page"),
+    offset_id: int = Query(0, ge=0, description="Cursor: last message ID of the previous page"),
+    offset_peer: Optional[int] = Query(None, description="Cursor: last dialog ID of the previous page"),
+    since: Optional[str] = Query(None, description="Version token; return only dialogs changed after it")
 ):
-    """Get list of all dialogs/chats"""
+    """Get list of all dialogs/chats, paginated by cursor or as a delta since a version"""
     try:
         client = await telegram_manager.get_client_or_restore(session_id)
         if not client:
             raise HTTPException(status_code=401, detail="Session not found")
 
-        dialogs = await telegram_manager.get_dialogs(session_id, limit)
-        return DialogsResponse(dialogs=dialogs)
+        if since and not force:
+            changes = telegram_manager.get_dialog_changes(session_id, since)
+            if changes is not None:
+                return DialogsResponse(
+                    dialogs=changes,
+                    version=telegram_manager.get_dialogs_version(session_id),
+                    full=False
+                )
+
+        dialogs = await telegram_manager.get_dialogs(
+            session_id, limit, force, offset_date, offset_id, offset_peer
+        )
+        return DialogsResponse(
+            dialogs=dialogs,
+            version=telegram_manager.get_dialogs_version(session_id),
+            next_offset=telegram_manager.get_dialogs_next_offset(dialogs, limit)
+        )
     except HTTPException:
         raise
     except Exception as e:
@@ -68,19 +91,37 @@ async def get_dialog(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+AVATAR_CACHE_CONTROL = "private, max-age=86400"
+
+
 @router.get("/avatar/{entity_id}")
 async def get_avatar(
     entity_id: int,
-    session_id: str = Query(..., description="Session ID")
+    session_id: str = Query(..., description="Session ID"),
+    if_none_match: Optional[str] = Header(None)
 ):
-    """Get profile photo as base64"""
+    """Get profile photo as image bytes with ETag/Cache-Control"""
     try:
         client = await telegram_manager.get_client_or_restore(session_id)
         if not client:
             raise HTTPException(status_code=401, detail="Session not found")
 
-        photo = await telegram_manager.get_profile_photo(session_id, entity_id)
-        return {"avatar": photo}
+        photo_id = await telegram_manager.get_avatar_photo_id(session_id, entity_id)
+        if photo_id is None:
+            raise HTTPException(status_code=404, detail="No profile photo")
+
+        etag = f'"{entity_id}-{photo_id}"'
+        headers = {"ETag": etag, "Cache-Control": AVATAR_CACHE_CONTROL}
+        if if_none_match == etag:
+            return Response(status_code=304, headers=headers)
+
+        avatar = await telegram_manager.get_avatar(session_id, entity_id)
+        if not avatar:
+            raise HTTPException(status_code=404, detail="No profile photo")
+
+        photo_id, photo = avatar
+        headers["ETag"] = f'"{entity_id}-{photo_id}"'
+        return Response(content=photo, media_type="image/jpeg", headers=headers)
     except HTTPException:
         raise
     except Exception as e:
@@ -106,6 +147,33 @@ async def get_avatars(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/avatars/stream")
+async def stream_avatars(
+    request: AvatarsRequest,
+    session_id: str = Query(..., description="Session ID")
+):
+    """Stream profile photos as NDJSON, one {"id", "avatar"} line per entity as soon as it resolves"""
+    try:
+        client = await telegram_manager.get_client_or_restore(session_id)
+        if not client:
+            raise HTTPException(status_code=401, detail="Session not found")
+
+        async def lines():
+            async for entity_id, photo in telegram_manager.iter_profile_photos(session_id, request.entity_ids):
+                yield json.dumps({"id": entity_id, "avatar": photo}) + "\n"
+
+        return StreamingResponse(
+            lines(),
+            media_type="application/x-ndjson",
+            # Keep nginx from buffering the stream
+            headers={"X-Accel-Buffering": "no"}
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.post("/mark-read/{chat_id}")
 async def mark_as_read(
     chat_id: int,
@@ -1,18 +1,19 @@
-from fastapi import APIRouter, HTTPException, Query, UploadFile, File
-from fastapi.responses import FileResponse
-from app.telegram_client import telegram_manager
+from fastapi import APIRouter, HTTPException, Query, UploadFile, File, Header
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from typing import Optional, AsyncIterator
+from app.telegram_client import telegram_manager, PREVIEW_SIZE
+from app.models.schemas import PreviewsRequest
+from app.websocket import manager as ws_manager
+from urllib.parse import quote
 import os
-import aiofiles
 import uuid
+import base64
+import json
+import aiofiles
 
 router = APIRouter(tags=["media"])
 
-UPLOAD_DIR = "uploads"
-DOWNLOAD_DIR = "downloads"
-
-# Ensure directories exist
-os.makedirs(UPLOAD_DIR, exist_ok=True)
-os.makedirs(DOWNLOAD_DIR, exist_ok=True)
+FILE_CHUNK_SIZE = 256 * 1024
 
 
 @router.post("/upload")
@@ -21,37 +22,51 @@ async def upload_and_send(
     session_id: str = Query(...),
     file: UploadFile = File(...),
     caption: str = Query(None),
-    reply_to: int = Query(None)
+    reply_to: int = Query(None),
+    upload_id: str = Query(None, description="Client ID echoed in upload_progress events")
 ):
-    """Upload and send a file to a chat"""
+    """Upload and send a file to a chat.
+
+    The body is streamed part by part from the request's spooled temp file
+    into Telegram, and progress is pushed as `upload_progress` WebSocket events.
+    """
     try:
         client = await telegram_manager.get_client_or_restore(session_id)
         if not client:
             raise HTTPException(status_code=401, detail="Session not found")
 
-        # Save file temporarily
-        file_ext = os.path.splitext(file.filename)[1] if file.filename else ""
-        temp_filename = f"{uuid.uuid4()}{file_ext}"
-        temp_path = os.path.join(UPLOAD_DIR, temp_filename)
-
-        async with aiofiles.open(temp_path, 'wb') as f:
-            content = await file.read()
-            await f.write(content)
-
-        try:
-            # Send file
-            message = await telegram_manager.send_file(
-                session_id,
-                chat_id,
-                temp_path,
-                caption=caption,
-                reply_to=reply_to
-            )
-            return message
-        finally:
-            # Cleanup temp file
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
+        file_size = file.size
+        if file_size is None:
+            file.file.seek(0, os.SEEK_END)
+            file_size = file.file.tell()
+            file.file.seek(0)
+
+        upload_id = upload_id or str(uuid.uuid4())
+        last_percent = -1
+
+        async def report_progress(sent: int, total: int):
+            nonlocal last_percent
+            percent = sent * 100 // total if total else 100
+            if percent != last_percent:
+                last_percent = percent
+                await ws_manager.send_to_session(session_id, "upload_progress", {
+                    "upload_id": upload_id,
+                    "chat_id": chat_id,
+                    "sent": sent,
+                    "total": total,
+                })
+
+        message = await telegram_manager.send_file(
+            session_id,
+            chat_id,
+            file,
+            caption=caption,
+            reply_to=reply_to,
+            file_name=file.filename or "file",
+            file_size=file_size,
+            progress_callback=report_progress
+        )
+        return message
 
     except HTTPException:
         raise
@@ -71,19 +86,117 @@ async def download_media(
         if not client:
             raise HTTPException(status_code=401, detail="Session not found")
 
-        file_path = await telegram_manager.download_media(
-            session_id,
-            chat_id,
-            message_id,
-            DOWNLOAD_DIR
-        )
+        message = await telegram_manager.get_media_message(session_id, chat_id, message_id)
+        if not message:
+            raise HTTPException(status_code=404, detail="Media not found")
 
+        file_path = await telegram_manager.download_message_media(session_id, message)
         if not file_path:
             raise HTTPException(status_code=404, detail="Media not found")
 
         return FileResponse(
             file_path,
-            filename=os.path.basename(file_path)
+            filename=telegram_manager.get_media_info(message)["file_name"]
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def _parse_range(range_header: Optional[str], size: int) -> Optional[tuple[int, int]]:
+    """Parse a single `bytes=` range into inclusive (start, end), None for the whole file"""
+    if not range_header:
+        return None
+
+    unsatisfiable = HTTPException(
+        status_code=416,
+        detail="Requested range not satisfiable",
+        headers={"Content-Range": f"bytes */{size}"}
+    )
+    unit, _, spec = range_header.partition("=")
+    if unit.strip() != "bytes" or "," in spec:
+        raise unsatisfiable
+
+    first, _, last = spec.strip().partition("-")
+    try:
+        if first:
+            start = int(first)
+            end = int(last) if last else size - 1
+        else:
+            # Suffix range: the last N bytes
+            start = max(0, size - int(last))
+            end = size - 1
+    except ValueError:
+        raise unsatisfiable
+
+    end = min(end, size - 1)
+    if start > end or start >= size:
+        raise unsatisfiable
+    return start, end
+
+
+async def _iter_file_range(path: str, start: int, end: int) -> AsyncIterator[bytes]:
+    """Yield bytes start..end (inclusive) of a local file"""
+    remaining = end - start + 1
+    async with aiofiles.open(path, 'rb') as f:
+        await f.seek(start)
+        while remaining > 0:
+            chunk = await f.read(min(FILE_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+@router.get("/stream/{chat_id}/{message_id}")
+async def stream_media(
+    chat_id: int,
+    message_id: int,
+    session_id: str = Query(...),
+    range_header: Optional[str] = Header(None, alias="Range")
+):
+    """Stream media with HTTP Range support, reading only the needed chunks from Telegram"""
+    try:
+        client = await telegram_manager.get_client_or_restore(session_id)
+        if not client:
+            raise HTTPException(status_code=401, detail="Session not found")
+
+        message = await telegram_manager.get_media_message(session_id, chat_id, message_id)
+        if not message:
+            raise HTTPException(status_code=404, detail="Media not found")
+
+        info = telegram_manager.get_media_info(message)
+        headers = {
+            "Content-Disposition": f"inline; filename*=UTF-8''{quote(info['file_name'])}",
+        }
+
+        if info["size"] is None:
+            # Photos have no fixed size up front; they're small, send them whole (no Range support)
+            data = await client.download_media(message, bytes)
+            return Response(content=data, media_type=info["mime_type"], headers=headers)
+
+        headers["Accept-Ranges"] = "bytes"
+        size = info["size"]
+        byte_range = _parse_range(range_header, size)
+        start, end = byte_range or (0, size - 1)
+        headers["Content-Length"] = str(end - start + 1)
+        if byte_range:
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+
+        # Serve from the media cache when the whole file is already downloaded
+        name = telegram_manager.media_cache_name(message)
+        cached_path = await telegram_manager.media_cache.lookup(name) if name else None
+        if cached_path:
+            body = _iter_file_range(cached_path, start, end)
+        else:
+            body = telegram_manager.iter_media_range(session_id, message, start, end)
+
+        return StreamingResponse(
+            body,
+            status_code=206 if byte_range else 200,
+            media_type=info["mime_type"],
+            headers=headers
         )
     except HTTPException:
         raise
@@ -91,47 +204,114 @@ async def download_media(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+PREVIEW_CACHE_CONTROL = "private, max-age=604800, immutable"
+
+
+@router.get("/thumb/{chat_id}/{message_id}")
+async def get_media_thumb(
+    chat_id: int,
+    message_id: int,
+    session_id: str = Query(...),
+    full: bool = Query(False, description="Original photo instead of a thumbnail"),
+    size: int = Query(PREVIEW_SIZE, ge=1, le=2560, description="Longest side to cover, in pixels"),
+    if_none_match: Optional[str] = Header(None)
+):
+    """Get a media preview as image bytes with caching headers"""
+    try:
+        client = await telegram_manager.get_client_or_restore(session_id)
+        if not client:
+            raise HTTPException(status_code=401, detail="Session not found")
+
+        message = await telegram_manager.get_media_message(session_id, chat_id, message_id)
+        if not message:
+            raise HTTPException(status_code=404, detail="Media not found")
+
+        name = telegram_manager.media_preview_name(message, full, size)
+        if not name:
+            raise HTTPException(status_code=404, detail="Preview not available")
+
+        # The ETag is known from the message alone: revalidation never downloads
+        etag = f'"{name}"'
+        headers = {"ETag": etag, "Cache-Control": PREVIEW_CACHE_CONTROL}
+        if if_none_match == etag:
+            return Response(status_code=304, headers=headers)
+
+        preview = await telegram_manager.get_media_preview(session_id, message, full, size)
+        if not preview:
+            raise HTTPException(status_code=404, detail="Preview not available")
+        return FileResponse(preview[1], media_type="image/jpeg", headers=headers)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.get("/preview/{chat_id}/{message_id}")
 async def get_media_preview(
     chat_id: int,
     message_id: int,
     session_id: str = Query(...),
-    full: bool = Query(False, description="Download full quality")
+    full: bool = Query(False, description="Download full quality"),
+    size: int = Query(PREVIEW_SIZE, ge=1, le=2560, description="Longest side to cover, in pixels")
 ):
-    """Get media preview as base64"""
+    """Get media preview as base64 (prefer the binary /thumb endpoint)"""
     try:
         client = await telegram_manager.get_client_or_restore(session_id)
         if not client:
             raise HTTPException(status_code=401, detail="Session not found")
 
-        tg_client = client
-        message = await tg_client.get_messages(chat_id, ids=message_id)
-
-        if not message or not message.media:
+        message = await telegram_manager.get_media_message(session_id, chat_id, message_id)
+        if not message:
             raise HTTPException(status_code=404, detail="Media not found")
 
-        import base64
-        from telethon.tl.types import MessageMediaPhoto
-
-        # For photos, download the actual image (not thumbnail)
-        if isinstance(message.media, MessageMediaPhoto):
-            # Download the photo itself (medium quality by default)
-            photo_bytes = await tg_client.download_media(message, bytes)
-            if photo_bytes:
-                return {
-                    "preview": base64.b64encode(photo_bytes).decode(),
-                    "type": "image/jpeg"
-                }
-        else:
-            # For other media types, download thumbnail
-            thumb = await tg_client.download_media(message, bytes, thumb=0)  # 0 for larger thumb
-            if thumb:
-                return {
-                    "preview": base64.b64encode(thumb).decode(),
-                    "type": "image/jpeg"
-                }
-
-        raise HTTPException(status_code=404, detail="Preview not available")
+        preview = await telegram_manager.get_media_preview(session_id, message, full, size)
+        if not preview:
+            raise HTTPException(status_code=404, detail="Preview not available")
+
+        async with aiofiles.open(preview[1], 'rb') as f:
+            data = await f.read()
+        return {
+            "preview": base64.b64encode(data).decode(),
+            "type": "image/jpeg"
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/previews/{chat_id}")
+async def stream_media_previews(
+    chat_id: int,
+    request: PreviewsRequest,
+    session_id: str = Query(...),
+    size: int = Query(PREVIEW_SIZE, ge=1, le=2560, description="Longest side to cover, in pixels"),
+    inline: bool = Query(True, description="Include base64 images; false only warms the cache for /thumb")
+):
+    """Stream previews for many messages of one chat as NDJSON, one line per message as it finishes"""
+    try:
+        client = await telegram_manager.get_client_or_restore(session_id)
+        if not client:
+            raise HTTPException(status_code=401, detail="Session not found")
+
+        async def lines():
+            async for message_id, data in telegram_manager.iter_media_previews(
+                session_id, chat_id, request.message_ids, size
+            ):
+                if not inline:
+                    yield json.dumps({"message_id": message_id, "ready": data is not None}) + "\n"
+                    continue
+                yield json.dumps({
+                    "message_id": message_id,
+                    "preview": base64.b64encode(data).decode() if data else None,
+                    "type": "image/jpeg",
+                }) + "\n"
+
+        return StreamingResponse(
+            lines(),
+            media_type="application/x-ndjson",
+            headers={"X-Accel-Buffering": "no"}
+        )
     except HTTPException:
         raise
     except Exception as e:
@@ -1,17 +1,60 @@
 from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import ORJSONResponse
 from app.telegram_client import telegram_manager
+from app.message_store import SearchQueryError
 from app.models.schemas import (
     MessagesResponse,
+    SearchMessagesResponse,
     SendMessageRequest,
     EditMessageRequest,
     DeleteMessageRequest,
     Message
 )
-from typing import List
+from typing import List, Optional
 
 router = APIRouter(tags=["messages"])
 
 
+@router.get("/search", response_model=SearchMessagesResponse)
+async def search_messages(
+    q: str = Query(..., min_length=1, description="Search text"),
+    session_id: str = Query(..., description="Session ID"),
+    chat_id: Optional[int] = Query(None, description="Limit search to one chat"),
+    limit: int = Query(50, ge=1, le=200, description="Number of results"),
+    offset: int = Query(0, ge=0, description="Number of results to skip"),
+    remote: bool = Query(False, description="Use Telegram's search if nothing is found locally")
+):
+    """Full-text search over locally stored messages"""
+    try:
+        # The index is local: check the session without reconnecting an evicted client
+        # (search_messages restores it only for the remote fallback)
+        if session_id not in telegram_manager.session_strings and session_id not in telegram_manager.clients:
+            raise HTTPException(status_code=401, detail="Session not found")
+
+        messages, source = await telegram_manager.search_messages(
+            session_id,
+            q,
+            chat_id=chat_id,
+            limit=limit,
+            offset=offset,
+            remote=remote
+        )
+        # Formatted messages are exactly the Message schema; encode them directly
+        return ORJSONResponse({
+            "messages": messages,
+            "query": q,
+            "chat_id": chat_id,
+            "source": source,
+            "next_offset": offset + limit if len(messages) == limit else None,
+        })
+    except HTTPException:
+        raise
+    except SearchQueryError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid search query: {e}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.get("/{chat_id}", response_model=MessagesResponse)
 async def get_messages(
     chat_id: int,
@@ -31,7 +74,8 @@ async def get_messages(
             limit=limit,
             offset_id=offset_id
         )
-        return MessagesResponse(messages=messages, chat_id=chat_id)
+        # Formatted messages are exactly the Message schema; encode them directly
+        return ORJSONResponse({"messages": messages, "chat_id": chat_id})
     except HTTPException:
         raise
     except Exception as e:
@@ -0,0 +1,147 @@
+from typing import AsyncIterator, Awaitable, Callable, Dict, Iterable, Tuple, TypeVar
+import asyncio
+import time
+
+from telethon.errors import FloodWaitError
+
+T = TypeVar("T")
+K = TypeVar("K")
+
+
+class RequestScheduler:
+    """Per-client token bucket with a concurrency limit that pauses on FloodWait.
+
+    The rate adapts (AIMD): every successful request raises it by `rate_step`
+    up to `max_rate`, and a FloodWait halves it down to `min_rate`.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: int,
+        concurrency: int,
+        max_retries: int = 3,
+        min_rate: float = 1.0,
+        max_rate: float = None,
+        rate_step: float = 0.5
+    ):
+        self.rate = rate
+        self.burst = burst
+        self.max_retries = max_retries
+        self.min_rate = min(min_rate, rate)
+        self.max_rate = max(max_rate or rate, rate)
+        self.rate_step = rate_step
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+        self._semaphore = asyncio.Semaphore(concurrency)
+        # Background requests only run while no foreground request is in flight
+        self._foreground = 0
+        self._quiet = asyncio.Event()
+        self._quiet.set()
+
+    def pause(self, seconds: float):
+        """Hold every request of this client for `seconds`"""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def _succeeded(self):
+        self.rate = min(self.max_rate, self.rate + self.rate_step)
+
+    def _flooded(self, seconds: float):
+        self.rate = max(self.min_rate, self.rate / 2)
+        self._tokens = min(self._tokens, 0.0)
+        self.pause(seconds)
+
+    async def _acquire(self):
+        """Wait for the pause to end and for a token to become available"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    @property
+    def busy(self) -> bool:
+        """True while a foreground request is queued or running"""
+        return self._foreground > 0
+
+    async def run(self, call: Callable[[], Awaitable[T]], background: bool = False) -> T:
+        """Run an RPC under the rate limit, retrying after FloodWait.
+
+        Background requests wait for foreground ones to finish first.
+        """
+        if not background:
+            self._foreground += 1
+            self._quiet.clear()
+        try:
+            for attempt in range(self.max_retries + 1):
+                if background:
+                    await self._quiet.wait()
+                await self._acquire()
+                async with self._semaphore:
+                    try:
+                        result = await call()
+                    except FloodWaitError as e:
+                        self._flooded(e.seconds)
+                        if attempt == self.max_retries:
+                            raise
+                        print(f"FloodWait: pausing requests for {e.seconds}s, rate now {self.rate:.1f}/s")
+                        continue
+                    self._succeeded()
+                    return result
+        finally:
+            if not background:
+                self._foreground -= 1
+                if self._foreground == 0:
+                    self._quiet.set()
+
+
+async def single_flight(inflight: Dict[K, asyncio.Task], key: K, start: Callable[[], Awaitable[T]]) -> T:
+    """Run start() once per key at a time and await its result.
+
+    The task is owned by `inflight`, not by the first caller, and every caller
+    awaits it through a shield, so a cancelled request never cancels the work
+    other requests are waiting on.
+    """
+    task = inflight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(start())
+        inflight[key] = task
+
+        def finished(t: asyncio.Task):
+            if inflight.get(key) is t:
+                del inflight[key]
+            # Mark retrieved so a failure nobody waited for doesn't log a warning
+            if not t.cancelled():
+                t.exception()
+
+        task.add_done_callback(finished)
+    return await asyncio.shield(task)
+
+
+async def iter_completed(
+    keys: Iterable[K],
+    call: Callable[[K], Awaitable[T]]
+) -> AsyncIterator[Tuple[K, T]]:
+    """Run call(key) for every key concurrently, yielding (key, result) as each finishes.
+
+    A failed call yields its exception as the result.
+    """
+    pending = {asyncio.ensure_future(call(key)): key for key in keys}
+    try:
+        while pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                key = pending.pop(task)
+                yield key, (task.exception() or task.result())
+    finally:
+        for task in pending:
+            task.cancel()
@@ -0,0 +1,119 @@
+from abc import ABC, abstractmethod
+import asyncio
+import json
+import os
+from typing import Dict
+
+from app.db import SQLiteDatabase
+
+
+class SessionStore(ABC):
+    """Persistent mapping of session_id -> Telethon session string"""
+
+    @abstractmethod
+    def load(self) -> Dict[str, str]:
+        """Load all saved sessions (called once at startup)"""
+
+    @abstractmethod
+    async def set(self, session_id: str, session_string: str):
+        """Insert or update a single session"""
+
+    @abstractmethod
+    async def delete(self, session_id: str):
+        """Remove a single session"""
+
+    def close(self):
+        pass
+
+
+class SQLiteSessionStore(SessionStore):
+    """Session store backed by a SQLite table, one row per session"""
+
+    def __init__(self, path: str, legacy_file: str = None):
+        self.db = SQLiteDatabase(path)
+        self.db.conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "session_id TEXT PRIMARY KEY, "
+            "session_string TEXT NOT NULL)"
+        )
+        if legacy_file:
+            self._import_legacy(legacy_file)
+
+    def _import_legacy(self, legacy_file: str):
+        """One-time import of an old sessions.json file"""
+        if not os.path.exists(legacy_file):
+            return
+        try:
+            with open(legacy_file, 'r') as f:
+                sessions = json.load(f)
+            self.db.conn.execute("BEGIN")
+            self.db.conn.executemany(
+                "INSERT OR IGNORE INTO sessions (session_id, session_string) VALUES (?, ?)",
+                list(sessions.items())
+            )
+            self.db.conn.execute("COMMIT")
+            os.replace(legacy_file, legacy_file + ".migrated")
+            print(f"Imported {len(sessions)} sessions from {legacy_file}")
+        except Exception as e:
+            print(f"Error importing legacy sessions from {legacy_file}: {e}")
+
+    def load(self) -> Dict[str, str]:
+        rows = self.db.conn.execute("SELECT session_id, session_string FROM sessions").fetchall()
+        return dict(rows)
+
+    async def set(self, session_id: str, session_string: str):
+        await self.db.execute(
+            "INSERT INTO sessions (session_id, session_string) VALUES (?, ?) "
+            "ON CONFLICT(session_id) DO UPDATE SET session_string = excluded.session_string",
+            (session_id, session_string)
+        )
+
+    async def delete(self, session_id: str):
+        await self.db.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    def close(self):
+        self.db.close()
+
+
+class JSONSessionStore(SessionStore):
+    """Legacy sessions.json store, rewritten atomically in a worker thread"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.sessions: Dict[str, str] = {}
+        self._lock = asyncio.Lock()
+
+    def load(self) -> Dict[str, str]:
+        if os.path.exists(self.path):
+            with open(self.path, 'r') as f:
+                self.sessions = json.load(f)
+        return dict(self.sessions)
+
+    def _write(self, sessions: Dict[str, str]):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(sessions, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    async def _flush(self):
+        async with self._lock:
+            await asyncio.to_thread(self._write, dict(self.sessions))
+
+    async def set(self, session_id: str, session_string: str):
+        self.sessions[session_id] = session_string
+        await self._flush()
+
+    async def delete(self, session_id: str):
+        if self.sessions.pop(session_id, None) is not None:
+            await self._flush()
+
+
+def create_session_store(backend: str, sqlite_path: str, json_path: str) -> SessionStore:
+    """Build the configured session store"""
+    if backend == "json":
+        return JSONSessionStore(json_path)
+    if backend == "sqlite":
+        return SQLiteSessionStore(sqlite_path, legacy_file=json_path)
+    raise ValueError(f"Unknown session store: {backend}")
@@ -1,108 +1,359 @@
 from telethon import TelegramClient, events
 from telethon.sessions import StringSession
 from telethon.errors import SessionPasswordNeededError, PhoneCodeInvalidError
+from telethon.utils import get_peer_id
 from telethon.tl.types import (
     User, Chat, Channel,
     MessageMediaPhoto, MessageMediaDocument,
     DocumentAttributeFilename, DocumentAttributeAudio,
     DocumentAttributeVideo, DocumentAttributeSticker,
-    UserStatusOnline, UserStatusOffline, UserStatusRecently
+    UserStatusOnline, UserStatusOffline, UserStatusRecently,
+    PhotoSize, PhotoCachedSize, PhotoSizeProgressive
 )
 from telethon.tl.functions.messages import SetTypingRequest, GetDialogsRequest
 from telethon.tl.functions.contacts import GetContactsRequest
 from telethon.tl.functions.channels import GetFullChannelRequest
 from telethon.tl.types import SendMessageTypingAction, InputPeerEmpty
-from typing import Optional, Callable, Dict, List, Any
+from typing import Optional, Callable, Dict, List, Any, AsyncIterator
+from collections import OrderedDict
 from datetime import datetime
 import asyncio
+import time
 import uuid
 import base64
 import os
-import json
+import aiofiles
 
 from app.config import get_settings
+from app.session_store import create_session_store
+from app.dialog_cache import DialogCache
+from app.avatar_cache import AvatarCache
+from app.media_cache import MediaCache
+from app.message_store import MessageStore
+from app.scheduler import RequestScheduler, iter_completed
+from app.metrics import InstrumentedClient, LIVE_CLIENTS, cache_result
 
 SESSIONS_FILE = "sessions.json"
+# Telegram's maximum upload.getFile chunk, used for ranged media streaming
+STREAM_CHUNK_SIZE = 512 * 1024
+# Default longest side (px) of media previews
+PREVIEW_SIZE = 320
+# Media messages resolved for previews, reused by the per-image /thumb requests that
+# follow; short-lived because file references expire
+MEDIA_MESSAGE_CACHE_SIZE = 2048
+MEDIA_MESSAGE_TTL = 300
+# Media constructor -> media_type, for media not classified by document attributes
+MEDIA_TYPES = {MessageMediaPhoto: "photo"}
+# Document attribute constructor -> media_type; the first classified attribute wins,
+# documents without one are "document"
+DOCUMENT_ATTRIBUTE_TYPES = {
+    DocumentAttributeSticker: lambda attr: "sticker",
+    DocumentAttributeAudio: lambda attr: "voice" if attr.voice else "audio",
+    DocumentAttributeVideo: lambda attr: "video_note" if attr.round_message else "video",
+}
+
+
+def _isoformat(date) -> Optional[str]:
+    """ISO 8601 as pydantic serialises UTC datetimes ("...Z"), so formatted messages match the schema"""
+    if date is None:
+        return None
+    return date.isoformat().replace("+00:00", "Z")
 
 
 class TelegramManager:
     def __init__(self):
-        self.clients: Dict[str, TelegramClient] = {}
+        # Ordered by last use, least recently used first
+        self.clients: "OrderedDict[str, TelegramClient]" = OrderedDict()
+        self._last_used: Dict[str, float] = {}
+        # session_id -> creation time of clients that haven't signed in yet
+        self._pending_logins: Dict[str, float] = {}
         self.sessions: Dict[str, str] = {}  # session_id -> phone
         self.session_strings: Dict[str, str] = {}  # session_id -> session_string
         self.ws_callbacks: Dict[str, Callable] = {}
+        # Called with the session_id whenever a client is (re)connected, e.g. to resume backfill
+        self.client_listeners: List[Callable[[str], None]] = []
+        self.dialog_caches: Dict[str, DialogCache] = {}
+        # session_id -> peer id -> (entity seen in dialogs/contacts/updates, monotonic time), used for avatars
+        self._entities: Dict[str, Dict[int, tuple]] = {}
+        self.schedulers: Dict[str, RequestScheduler] = {}
+        # (session_id, chat_id, message_id) -> (media message, monotonic time), LRU first
+        self._media_messages: "OrderedDict[tuple, tuple]" = OrderedDict()
+        # session_id -> in-flight restore, shared by concurrent callers
+        self._restore_tasks: Dict[str, asyncio.Task] = {}
+        # session_id -> monotonic time of the last failed restore
+        self._restore_failures: Dict[str, float] = {}
         settings = get_settings()
         self.api_id = settings.telegram_api_id
         self.api_hash = settings.telegram_api_hash
+        self.restore_failure_ttl = settings.restore_failure_ttl
+        self.max_clients = settings.max_clients
+        self.client_idle_ttl = settings.client_idle_ttl
+        self.pending_login_ttl = settings.pending_login_ttl
+        self.avatar_entity_ttl = settings.avatar_entity_ttl
+        self.avatar_cache = AvatarCache(settings.avatar_cache_dir, settings.avatar_memory_cache_bytes)
+        self.media_cache = MediaCache(settings.media_cache_dir, settings.media_cache_max_bytes)
+        self.message_store = MessageStore(settings.message_db_path)
+        self.settings = settings
+        self.warmup_status = {
+            "state": "disabled",
+            "total": 0,
+            "completed": 0,
+            "restored": 0,
+            "failed": 0,
+        }
+        self.session_store = create_session_store(
+            settings.session_store, settings.session_db_path, SESSIONS_FILE
+        )
         self._load_sessions()
+        LIVE_CLIENTS.set_function(lambda: len(self.clients))
+
+    def _new_client(self, session) -> TelegramClient:
+        """TelegramClient whose calls are recorded in the RPC metrics"""
+        return InstrumentedClient(TelegramClient(session, self.api_id, self.api_hash))
 
     def _load_sessions(self):
-        """Load saved sessions from file"""
+        """Load saved sessions from the session store"""
         try:
-            if os.path.exists(SESSIONS_FILE):
-                with open(SESSIONS_FILE, 'r') as f:
-                    self.session_strings = json.load(f)
-                print(f"Loaded {len(self.session_strings)} saved sessions")
+            self.session_strings = self.session_store.load()
+            print(f"Loaded {len(self.session_strings)} saved sessions")
         except Exception as e:
             print(f"Error loading sessions: {e}")
             self.session_strings = {}
 
-    def _save_sessions(self):
-        """Save sessions to file"""
+    async def _save_session(self, session_id: str, session_string: str):
+        """Persist a single session"""
+        self.session_strings[session_id] = session_string
         try:
-            with open(SESSIONS_FILE, 'w') as f:
-                json.dump(self.session_strings, f)
+            await self.session_store.set(session_id, session_string)
         except Exception as e:
-            print(f"Error saving sessions: {e}")
+            print(f"Error saving session {session_id}: {e}")
+
+    async def _delete_session(self, session_id: str):
+        """Forget a single saved session"""
+        self.session_strings.pop(session_id, None)
+        try:
+            await self.session_store.delete(session_id)
+        except Exception as e:
+            print(f"Error deleting session {session_id}: {e}")
 
     async def _auto_restore_session(self, session_id: str) -> Optional[TelegramClient]:
         """Auto-restore a session from saved session_string"""
         if session_id not in self.session_strings:
             return None
 
+        client = None
         try:
             session_string = self.session_strings[session_id]
             session = StringSession(session_string)
-            client = TelegramClient(session, self.api_id, self.api_hash)
+            client = self._new_client(session)
             await client.connect()
 
             if await client.is_user_authorized():
-                self.clients[session_id] = client
+                await self._register_client(session_id, client)
                 print(f"Auto-restored session: {session_id}")
                 return client
             else:
                 # Session expired, remove it
-                del self.session_strings[session_id]
-                self._save_sessions()
+                await self._delete_session(session_id)
                 await client.disconnect()
         except Exception as e:
             print(f"Error auto-restoring session {session_id}: {e}")
+            if client:
+                try:
+                    await client.disconnect()
+                except:
+                    pass
 
         return None
 
+    async def warm_up(self, concurrency: int = 10):
+        """Reconnect all saved sessions in the background with bounded concurrency"""
+        # Warming more sessions than the client cap would only evict them again
+        session_ids = list(self.session_strings.keys())[:self.max_clients]
+        status = {
+            "state": "running",
+            "total": len(session_ids),
+            "completed": 0,
+            "restored": 0,
+            "failed": 0,
+        }
+        self.warmup_status = status
+        print(f"Warming up {len(session_ids)} saved sessions (concurrency={concurrency})")
+
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        report_every = max(1, len(session_ids) // 10)
+
+        async def warm(session_id: str):
+            async with semaphore:
+                client = await self.get_client_or_restore(session_id)
+            status["completed"] += 1
+            if client:
+                status["restored"] += 1
+            else:
+                status["failed"] += 1
+            if status["completed"] % report_every == 0:
+                print(f"Warm-up progress: {status['completed']}/{status['total']}")
+
+        await asyncio.gather(*(warm(session_id) for session_id in session_ids))
+        status["state"] = "done"
+        print(f"Warm-up finished: {status['restored']} restored, {status['failed']} failed")
+
+    def warmup_ready(self, threshold: float) -> bool:
+        """Whether enough saved sessions have been warmed up to accept traffic"""
+        status = self.warmup_status
+        if status["state"] in ("disabled", "done") or status["total"] == 0:
+            return True
+        return status["completed"] / status["total"] >= threshold
+
     async def create_client(self, session_id: str = None, session_string: str = None) -> tuple[str, TelegramClient]:
         """Create a new Telegram client"""
         if session_id is None:
             session_id = str(uuid.uuid4())
 
         session = StringSession(session_string) if session_string else StringSession()
-        client = TelegramClient(session, self.api_id, self.api_hash)
+        client = self._new_client(session)
         await client.connect()
-        self.clients[session_id] = client
+        if session_string is None:
+            self._pending_logins[session_id] = time.monotonic()
+        await self._register_client(session_id, client)
         return session_id, client
 
+    async def _register_client(self, session_id: str, client: TelegramClient):
+        """Track a connected client and enforce the client cap"""
+        self.clients[session_id] = client
+        self._touch(session_id)
+        self._setup_dispatcher(session_id, client)
+        await self._enforce_client_cap(keep=session_id)
+        for listener in self.client_listeners:
+            listener(session_id)
+
+    def _touch(self, session_id: str):
+        """Mark a client as most recently used"""
+        self.clients.move_to_end(session_id)
+        self._last_used[session_id] = time.monotonic()
+
+    def _is_pinned(self, session_id: str) -> bool:
+        """Clients with live WebSocket subscribers are never evicted"""
+        return session_id in self.ws_callbacks
+
+    async def _evict_client(self, session_id: str, reason: str):
+        """Disconnect a client but keep its saved session restorable"""
+        client = self.clients.pop(session_id, None)
+        self._last_used.pop(session_id, None)
+        self.dialog_caches.pop(session_id, None)
+        self._entities.pop(session_id, None)
+        self.schedulers.pop(session_id, None)
+        # Updates stop with the client, so the newest stored pages can go stale
+        self.message_store.reset_heads(session_id)
+        if self._pending_logins.pop(session_id, None) is not None:
+            self.sessions.pop(session_id, None)
+        if client:
+            print(f"Evicting client {session_id} ({reason})")
+            try:
+                await client.disconnect()
+            except:
+                pass
+
+    async def _enforce_client_cap(self, keep: str = None):
+        """Evict least recently used clients above max_clients"""
+        while len(self.clients) > self.max_clients:
+            victim = next(
+                (sid for sid in self.clients if sid != keep and not self._is_pinned(sid)),
+                None
+            )
+            if victim is None:
+                break
+            await self._evict_client(victim, "client cap reached")
+
+    async def evict_idle_clients(self):
+        """Disconnect idle clients and abandoned logins"""
+        now = time.monotonic()
+        for session_id, created in list(self._pending_logins.items()):
+            if now - created > self.pending_login_ttl:
+                await self._evict_client(session_id, "login not completed")
+
+        for session_id in list(self.clients):
+            if self._is_pinned(session_id) or session_id in self._pending_logins:
+                continue
+            last_used = self._last_used.get(session_id, now)
+            if now - last_used > self.client_idle_ttl:
+                await self._evict_client(session_id, "idle")
+
+    async def run_eviction_loop(self, interval: float):
+        """Periodically evict idle clients until cancelled"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.evict_idle_clients()
+            except Exception as e:
+                print(f"Error evicting idle clients: {e}")
+
+    def idle_seconds(self, session_id: str) -> float:
+        """Seconds since the session last served a request"""
+        last_used = self._last_used.get(session_id)
+        if last_used is None:
+            return float("inf")
+        return time.monotonic() - last_used
+
+    def get_scheduler(self, session_id: str) -> RequestScheduler:
+        """Rate limiter shared by all scheduled RPCs of a session"""
+        scheduler = self.schedulers.get(session_id)
+        if scheduler is None:
+            scheduler = RequestScheduler(
+                self.settings.rpc_rate,
+                self.settings.rpc_burst,
+                self.settings.rpc_concurrency,
+                self.settings.rpc_flood_retries,
+                min_rate=self.settings.rpc_min_rate,
+                max_rate=self.settings.rpc_max_rate,
+                rate_step=self.settings.rpc_rate_step
+            )
+            self.schedulers[session_id] = scheduler
+        return scheduler
+
     def get_client(self, session_id: str) -> Optional[TelegramClient]:
         """Get existing client by session ID"""
-        return self.clients.get(session_id)
+        client = self.clients.get(session_id)
+        if client:
+            self._touch(session_id)
+        return client
 
     async def get_client_or_restore(self, session_id: str) -> Optional[TelegramClient]:
-        """Get existing client or auto-restore from saved session"""
+        """Get existing client or auto-restore from saved session.
+
+        Concurrent callers for the same session share a single in-flight
+        restore, and a failed restore is remembered for a short while so a
+        burst of requests doesn't reconnect over and over.
+        """
         client = self.clients.get(session_id)
         if client:
+            self._touch(session_id)
             return client
 
-        # Try to auto-restore
-        return await self._auto_restore_session(session_id)
+        if session_id not in self.session_strings:
+            return None
+
+        failed_at = self._restore_failures.get(session_id)
+        if failed_at is not None:
+            if time.monotonic() - failed_at < self.restore_failure_ttl:
+                return None
+            del self._restore_failures[session_id]
+
+        task = self._restore_tasks.get(session_id)
+        if task is None:
+            task = asyncio.create_task(self._auto_restore_session(session_id))
+            self._restore_tasks[session_id] = task
+            task.add_done_callback(lambda t: self._finish_restore(session_id, t))
+
+        # Shield so a cancelled request doesn't abort the restore for everyone else
+        return await asyncio.shield(task)
+
+    def _finish_restore(self, session_id: str, task: asyncio.Task):
+        """Drop a finished restore task and cache its failure"""
+        if self._restore_tasks.get(session_id) is task:
+            del self._restore_tasks[session_id]
+        if task.cancelled() or task.exception() is not None or task.result() is None:
+            self._restore_failures[session_id] = time.monotonic()
 
     async def send_code(self, session_id: str, phone: str) -> str:
         """Send verification code to phone number"""
@@ -130,17 +381,15 @@ class TelegramManager:
         try:
             user = await client.sign_in(phone, code, phone_code_hash=phone_code_hash)
             session_string = client.session.save()
-            # Save session to file
-            self.session_strings[session_id] = session_string
-            self._save_sessions()
+            await self._save_session(session_id, session_string)
+            self._pending_logins.pop(session_id, None)
             return True, session_string, self._format_user(user)
         except SessionPasswordNeededError:
             if password:
                 user = await client.sign_in(password=password)
                 session_string = client.session.save()
-                # Save session to file
-                self.session_strings[session_id] = session_string
-                self._save_sessions()
+                await self._save_session(session_id, session_string)
+                self._pending_logins.pop(session_id, None)
                 return True, session_string, self._format_user(user)
             return False, None, {"needs_2fa": True}
         except PhoneCodeInvalidError:
@@ -154,9 +403,8 @@ class TelegramManager:
 
         user = await client.sign_in(password=password)
         session_string = client.session.save()
-        # Save session to file
-        self.session_strings[session_id] = session_string
-        self._save_sessions()
+        await self._save_session(session_id, session_string)
+        self._pending_logins.pop(session_id, None)
         return session_string, self._format_user(user)
 
     async def restore_session(self, session_string: str) -> tuple[str, dict]:
@@ -166,28 +414,38 @@ class TelegramManager:
         if not await client.is_user_authorized():
             raise ValueError("Session expired or invalid")
 
-        # Save session to file
-        self.session_strings[session_id] = session_string
-        self._save_sessions()
+        await self._save_session(session_id, session_string)
 
         me = await client.get_me()
         return session_id, self._format_user(me)
 
     async def logout(self, session_id: str):
-        """Logout and cleanup"""
-        client = self.clients.get(session_id)
+        """Logout and cleanup, restoring an evicted client so the authorization is revoked"""
+        client = await self.get_client_or_restore(session_id)
         if client:
-            await client.log_out()
-            await client.disconnect()
-            del self.clients[session_id]
-            if session_id in self.sessions:
-                del self.sessions[session_id]
-            if session_id in self.ws_callbacks:
-                del self.ws_callbacks[session_id]
-            # Remove saved session
-            if session_id in self.session_strings:
-                del self.session_strings[session_id]
-                self._save_sessions()
+            try:
+                await client.log_out()
+            except Exception as e:
+                print(f"Error logging out {session_id}: {e}")
+            try:
+                await client.disconnect()
+            except:
+                pass
+        self.clients.pop(session_id, None)
+        self._last_used.pop(session_id, None)
+        self._pending_logins.pop(session_id, None)
+        self._restore_failures.pop(session_id, None)
+        self.dialog_caches.pop(session_id, None)
+        self._entities.pop(session_id, None)
+        self.schedulers.pop(session_id, None)
+        self.sessions.pop(session_id, None)
+        self.ws_callbacks.pop(session_id, None)
+        self._media_messages = OrderedDict(
+            (key, value) for key, value in self._media_messages.items() if key[0] != session_id
+        )
+        # Remove saved session and stored history
+        await self._delete_session(session_id)
+        await self.message_store.delete_session(session_id)
 
     async def disconnect_all(self):
         """Disconnect all clients on shutdown"""
@@ -197,7 +455,14 @@ class TelegramManager:
             except:
                 pass
         self.clients.clear()
+        self._last_used.clear()
+        self._pending_logins.clear()
+        self.dialog_caches.clear()
+        self._entities.clear()
+        self.schedulers.clear()
         self.sessions.clear()
+        self.session_store.close()
+        self.message_store.close()
 
     # Contacts methods
     async def get_contacts(self, session_id: str) -> List[dict]:
@@ -211,6 +476,7 @@ class TelegramManager:
 
         for user in result.users:
             if isinstance(user, User) and not user.bot and not user.deleted:
+                self._remember_entity(session_id, user)
                 status = self._get_user_status(user)
                 contacts.append({
                     "id": user.id,
@@ -244,18 +510,43 @@ class TelegramManager:
         return "last seen a long time ago"
 
     # Dialog/Chat methods
-    async def get_dialogs(self, session_id: str, limit: int = 100) -> List[dict]:
-        """Get list of dialogs"""
+    async def get_dialogs(
+        self,
+        session_id: str,
+        limit: int = 100,
+        force: bool = False,
+        offset_date: datetime = None,
+        offset_id: int = 0,
+        offset_peer: int = None
+    ) -> List[dict]:
+        """Get list of dialogs.
+
+        The first page is served from the dialog cache unless it is cold or
+        `force` is set; pages after an offset cursor always go to Telegram.
+        """
         client = await self.get_client_or_restore(session_id)
         if not client:
             raise ValueError("Client not found")
 
+        if offset_date or offset_id or offset_peer:
+            return await self._get_dialogs_page(
+                session_id, client, limit, offset_date, offset_id, offset_peer
+            )
+
+        cache = self.dialog_caches.setdefault(session_id, DialogCache())
+        if not force:
+            cached = cache.get(limit)
+            cache_result("dialogs", "miss" if cached is None else "hit")
+            if cached is not None:
+                return cached
+
         print(f"Getting dialogs for session {session_id}, limit={limit}")
         dialogs = await client.get_dialogs(limit=limit)
         print(f"Got {len(dialogs)} raw dialogs")
         result = []
 
         for d in dialogs:
+            self._remember_entity(session_id, d.entity)
             try:
                 dialog_data = await self._format_dialog(client, d)
                 result.append(dialog_data)
@@ -264,8 +555,65 @@ class TelegramManager:
                 continue
 
         print(f"Formatted {len(result)} dialogs")
+        cache.fill(result, limit)
+        return result
+
+    async def _get_dialogs_page(
+        self,
+        session_id: str,
+        client: TelegramClient,
+        limit: int,
+        offset_date: datetime,
+        offset_id: int,
+        offset_peer: int
+    ) -> List[dict]:
+        """Fetch one page of dialogs after an offset cursor"""
+        peer = InputPeerEmpty()
+        if offset_peer:
+            try:
+                peer = await client.get_input_entity(offset_peer)
+            except Exception:
+                # Unknown peer after a restart: date/id alone still page correctly
+                pass
+
+        dialogs = await client.get_dialogs(
+            limit=limit,
+            offset_date=offset_date,
+            offset_id=offset_id,
+            offset_peer=peer
+        )
+        result = []
+        for d in dialogs:
+            self._remember_entity(session_id, d.entity)
+            try:
+                result.append(await self._format_dialog(client, d))
+            except Exception as e:
+                print(f"Error formatting dialog {d.id}: {e}")
         return result
 
+    def get_dialog_changes(self, session_id: str, since: str) -> Optional[List[dict]]:
+        """Dialogs changed after a version token, or None if a full reload is needed"""
+        cache = self.dialog_caches.get(session_id)
+        if not cache:
+            return None
+        return cache.changes_since(since)
+
+    def get_dialogs_version(self, session_id: str) -> Optional[str]:
+        """Current dialog cache version token"""
+        cache = self.dialog_caches.get(session_id)
+        return cache.token if cache and cache.warm else None
+
+    def get_dialogs_next_offset(self, dialogs: List[dict], limit: int) -> Optional[dict]:
+        """Cursor for the page after `dialogs`, None when there are no more"""
+        if len(dialogs) < limit or not dialogs:
+            return None
+        last = dialogs[-1]
+        return {
+            "offset_date": last.get("last_message_date"),
+            "offset_id": last.get("last_message_id") or 0,
+            "offset_peer": last["id"],
+        }
+
     async def get_dialog_by_id(self, session_id: str, chat_id: int) -> dict:
         """Get single dialog by ID"""
         client = await self.get_client_or_restore(session_id)
@@ -283,17 +631,66 @@ class TelegramManager:
         limit: int = 50,
         offset_id: int = 0
     ) -> List[dict]:
-        """Get messages from a chat"""
+        """Get messages from a chat, served from the local store where the range is known"""
         client = await self.get_client_or_restore(session_id)
         if not client:
             raise ValueError("Client not found")
 
+        cached = []
+        page = await self.message_store.get_page(session_id, chat_id, limit, offset_id)
+        if page is None:
+            cache_result("messages", "miss")
+        else:
+            cached, gap = page
+            cache_result("messages", "hit" if gap is None else "partial")
+            if gap is None:
+                return cached
+            # Only fetch what the store is missing below the cached part
+            offset_id, limit = gap
+
         messages = await client.get_messages(
             chat_id,
             limit=limit,
             offset_id=offset_id
         )
-        return [await self._format_message(client, m) for m in messages]
+        fetched = self.format_messages(messages)
+        try:
+            await self.message_store.save_page(session_id, chat_id, fetched, offset_id, limit)
+        except Exception as e:
+            print(f"Error storing messages for {session_id}: {e}")
+        return cached + fetched
+
+    async def search_messages(
+        self,
+        session_id: str,
+        query: str,
+        chat_id: Optional[int] = None,
+        limit: int = 50,
+        offset: int = 0,
+        remote: bool = False
+    ) -> tuple:
+        """Search the local message index, optionally falling back to Telegram's search.
+
+        Returns (messages, source) where source is "local" or "telegram".
+        """
+        messages = await self.message_store.search(session_id, query, chat_id, limit, offset)
+        if messages or not remote:
+            return messages, "local"
+
+        client = await self.get_client_or_restore(session_id)
+        if not client:
+            raise ValueError("Client not found")
+
+        # Global search ignores add_offset, so page by slicing
+        found = await self.get_scheduler(session_id).run(
+            lambda: client.get_messages(chat_id, search=query, limit=offset + limit)
+        )
+        messages = self.format_messages(found[offset:])
+        try:
+            await self.message_store.add_messages(session_id, messages)
+        except Exception as e:
+            print(f"Error indexing search results for {session_id}: {e}")
+        return messages, "telegram"
 
     async def send_message(
         self,
@@ -315,7 +712,7 @@ class TelegramManager:
             reply_to=reply_to
         )
         print(f"Message sent, id={msg.id}")
-        return await self._format_message(client, msg)
+        return self._format_message(msg)
 
     async def edit_message(
         self,
@@ -330,7 +727,7 @@ class TelegramManager:
             raise ValueError("Client not found")
 
         msg = await client.edit_message(chat_id, message_id, text)
-        return await self._format_message(client, msg)
+        return self._format_message(msg)
 
     async def delete_messages(
         self,
@@ -359,7 +756,7 @@ class TelegramManager:
             raise ValueError("Client not found")
 
         messages = await client.forward_messages(to_chat, message_ids, from_chat)
-        return [await self._format_message(client, m) for m in messages]
+        return self.format_messages(messages)
 
     async def mark_as_read(self, session_id: str, chat_id: int):
         """Mark all messages in chat as read"""
@@ -368,6 +765,9 @@ class TelegramManager:
             raise ValueError("Client not found")
 
         await client.send_read_acknowledge(chat_id)
+        cache = self.dialog_caches.get(session_id)
+        if cache:
+            cache.apply_read(chat_id)
 
     async def send_typing(self, session_id: str, chat_id: int):
         """Send typing indicator"""
@@ -382,41 +782,300 @@ class TelegramManager:
         self,
         session_id: str,
         chat_id: int,
-        file_path: str,
+        file,
         caption: str = None,
-        reply_to: int = None
+        reply_to: int = None,
+        file_name: str = None,
+        file_size: int = None,
+        progress_callback: Callable = None
     ) -> dict:
-        """Send a file/media"""
+        """Send a file/media.
+
+        `file` is a path or a readable stream. Streams need `file_size` and
+        are uploaded part by part, so they are never read fully into memory.
+        """
         client = await self.get_client_or_restore(session_id)
         if not client:
             raise ValueError("Client not found")
 
+        if file_size is not None:
+            file = await client.upload_file(
+                file,
+                file_size=file_size,
+                file_name=file_name,
+                progress_callback=progress_callback
+            )
+
         msg = await client.send_file(
             chat_id,
-            file_path,
+            file,
             caption=caption,
-            reply_to=reply_to
+            reply_to=reply_to,
+            progress_callback=progress_callback if file_size is None else None
         )
-        return await self._format_message(client, msg)
+        return self._format_message(msg)
 
     async def download_media(
         self,
         session_id: str,
         chat_id: int,
-        message_id: int,
-        download_path: str = None
-    ) -> str:
-        """Download media from a message"""
+        message_id: int
+    ) -> Optional[str]:
+        """Download media from a message into the media cache"""
+        message = await self.get_media_message(session_id, chat_id, message_id)
+        if message:
+            return await self.download_message_media(session_id, message)
+        return None
+
+    def media_cache_name(self, message) -> Optional[str]:
+        """Cache file name of a message's media, keyed by Telegram id and access_hash"""
+        media = message.media
+        if isinstance(media, MessageMediaPhoto) and media.photo:
+            kind, obj = "photo", media.photo
+        elif isinstance(media, MessageMediaDocument) and media.document:
+            kind, obj = "doc", media.document
+        else:
+            return None
+        return f"{kind}_{obj.id}_{obj.access_hash}{message.file.ext or ''}"
+
+    async def download_message_media(self, session_id: str, message) -> Optional[str]:
+        """Path of the message's media in the cache, downloading it at most once"""
         client = await self.get_client_or_restore(session_id)
         if not client:
             raise ValueError("Client not found")
 
+        name = self.media_cache_name(message)
+        if name is None:
+            # Media without a stable id (e.g. web pages, contacts)
+            return None
+        return await self.media_cache.get_or_download(
+            name,
+            lambda tmp_path: client.download_media(message, tmp_path)
+        )
+
+    # Avatar methods
+    def _remember_entity(self, session_id: str, entity):
+        """Keep an entity around so avatars don't need an extra get_entity call"""
+        if entity is not None:
+            self._entities.setdefault(session_id, {})[get_peer_id(entity)] = (entity, time.monotonic())
+
+    async def _resolve_avatar_entity(self, session_id: str, client: TelegramClient, entity_id: int):
+        """Entity with up-to-date photo info for an avatar request.
+
+        Remembered entities are refreshed by updates and expire after
+        avatar_entity_ttl, so a changed profile photo is eventually seen.
+        """
+        entity, remembered_at = self._entities.get(session_id, {}).get(entity_id, (None, 0.0))
+        if entity is None or time.monotonic() - remembered_at > self.avatar_entity_ttl:
+            scheduler = self.get_scheduler(session_id)
+            entity = await scheduler.run(lambda: client.get_entity(entity_id))
+            self._remember_entity(session_id, entity)
+        return entity
+
+    def _photo_id(self, entity) -> Optional[int]:
+        """ID of the entity's current profile photo, None if it has none"""
+        return getattr(getattr(entity, 'photo', None), 'photo_id', None)
+
+    async def get_avatar_photo_id(self, session_id: str, entity_id: int) -> Optional[int]:
+        """Current profile photo ID of an entity"""
+        client = await self.get_client_or_restore(session_id)
+        if not client:
+            raise ValueError("Client not found")
+
+        entity = await self._resolve_avatar_entity(session_id, client, entity_id)
+        return self._photo_id(entity)
+
+    async def get_avatar(self, session_id: str, entity_id: int) -> Optional[tuple[int, bytes]]:
+        """Get profile photo bytes with their photo ID, served from the avatar cache"""
+        client = await self.get_client_or_restore(session_id)
+        if not client:
+            raise ValueError("Client not found")
+
+        return await self._fetch_avatar(session_id, client, entity_id)
+
+    async def _fetch_avatar(self, session_id: str, client: TelegramClient, entity_id: int) -> Optional[tuple[int, bytes]]:
+        """Download a profile photo only when its photo_id isn't cached yet"""
+        entity = await self._resolve_avatar_entity(session_id, client, entity_id)
+        photo_id = self._photo_id(entity)
+        if photo_id is None:
+            return None
+
+        scheduler = self.get_scheduler(session_id)
+        photo = await self.avatar_cache.get_or_fetch(
+            entity_id, photo_id,
+            lambda: scheduler.run(lambda: client.download_profile_photo(entity, bytes))
+        )
+        return (photo_id, photo) if photo else None
+
+    async def get_media_message(self, session_id: str, chat_id: int, message_id: int):
+        """Get a message that carries media, or None"""
+        client = await self.get_client_or_restore(session_id)
+        if not client:
+            raise ValueError("Client not found")
+
+        key = (session_id, chat_id, message_id)
+        cached = self._media_messages.get(key)
+        if cached and time.monotonic() - cached[1] < MEDIA_MESSAGE_TTL:
+            return cached[0]
+
         message = await client.get_messages(chat_id, ids=message_id)
         if message and message.media:
-            path = await client.download_media(message, download_path or "downloads/")
-            return path
+            self._remember_media_message(session_id, chat_id, message)
+            return message
         return None
 
+    def _remember_media_message(self, session_id: str, chat_id: int, message):
+        key = (session_id, chat_id, message.id)
+        self._media_messages.pop(key, None)
+        self._media_messages[key] = (message, time.monotonic())
+        while len(self._media_messages) > MEDIA_MESSAGE_CACHE_SIZE:
+            self._media_messages.popitem(last=False)
+
+    def get_media_info(self, message) -> dict:
+        """Size, MIME type and file name of a message's media (size is None for photos)"""
+        file = message.file
+        return {
+            "size": file.size if isinstance(message.media, MessageMediaDocument) else None,
+            "mime_type": file.mime_type or "application/octet-stream",
+            "file_name": file.name or f"{message.id}{file.ext or ''}",
+        }
+
+    async def iter_media_range(
+        self,
+        session_id: str,
+        message,
+        start: int,
+        end: int
+    ) -> AsyncIterator[bytes]:
+        """Yield bytes start..end (inclusive) of a document, fetching only the chunks that cover them"""
+        client = await self.get_client_or_restore(session_id)
+        if not client:
+            raise ValueError("Client not found")
+
+        # Telegram serves chunks at aligned offsets; trim the first and last ones
+        aligned = start - start % STREAM_CHUNK_SIZE
+        skip = start - aligned
+        remaining = end - start + 1
+        chunks = client.iter_download(
+            message.media,
+            offset=aligned,
+            request_size=STREAM_CHUNK_SIZE,
+            file_size=message.file.size
+        )
+        try:
+            async for chunk in chunks:
+                if skip:
+                    chunk = chunk[skip:]
+                    skip = 0
+                if len(chunk) > remaining:
+                    chunk = chunk[:remaining]
+                remaining -= len(chunk)
+                yield chunk
+                if remaining <= 0:
+                    break
+        finally:
+            # Stopping early must still release the sender borrowed for another DC
+            await chunks.aclose()
+
+    def _pick_thumb(self, sizes, target: int):
+        """Smallest photo size whose longest side covers `target`, else the largest one"""
+        candidates = [
+            s for s in sizes or []
+            if isinstance(s, (PhotoSize, PhotoCachedSize, PhotoSizeProgressive))
+        ]
+        if not candidates:
+            return None
+        candidates.sort(key=lambda s: max(s.w, s.h))
+        return next((s for s in candidates if max(s.w, s.h) >= target), candidates[-1])
+
+    def _preview_target(self, message, full: bool, size: int) -> Optional[tuple]:
+        """(cache name, thumb or None for the original) of a message's preview.
+
+        Photos use the smallest PhotoSize covering `size` (or the original
+        with `full`); documents such as videos use their thumbnails.
+        """
+        media = message.media
+        if isinstance(media, MessageMediaPhoto) and media.photo:
+            kind, obj, sizes = "photo", media.photo, media.photo.sizes
+        elif isinstance(media, MessageMediaDocument) and media.document:
+            kind, obj, sizes = "doc", media.document, media.document.thumbs
+            full = False
+        else:
+            return None
+
+        thumb = None if full else self._pick_thumb(sizes, size)
+        if thumb is None and not full:
+            return None
+
+        size_type = thumb.type if thumb else "full"
+        return f"thumb_{kind}_{obj.id}_{obj.access_hash}_{size_type}.jpg", thumb
+
+    def media_preview_name(self, message, full: bool = False, size: int = PREVIEW_SIZE) -> Optional[str]:
+        """Cache name (and ETag) of a message's preview, known without downloading it"""
+        target = self._preview_target(message, full, size)
+        return target[0] if target else None
+
+    async def get_media_preview(
+        self,
+        session_id: str,
+        message,
+        full: bool = False,
+        size: int = PREVIEW_SIZE
+    ) -> Optional[tuple[str, str]]:
+        """Cached (name, path) of a preview image for a message's media"""
+        client = await self.get_client_or_restore(session_id)
+        if not client:
+            raise ValueError("Client not found")
+
+        target = self._preview_target(message, full, size)
+        if target is None:
+            return None
+        name, thumb = target
+        scheduler = self.get_scheduler(session_id)
+        path = await self.media_cache.get_or_download(
+            name,
+            lambda tmp_path: scheduler.run(lambda: client.download_media(
+                message, tmp_path, thumb=thumb.type if thumb else None
+            ))
+        )
+        return (name, path) if path else None
+
+    async def iter_media_previews(
+        self,
+        session_id: str,
+        chat_id: int,
+        message_ids: List[int],
+        size: int = PREVIEW_SIZE
+    ) -> AsyncIterator[tuple[int, Optional[bytes]]]:
+        """Yield (message_id, preview bytes or None) as each preview is ready.
+
+        All messages are resolved with a single get_messages call; thumbnails
+        then download concurrently under the session's RequestScheduler.
+        """
+        client = await self.get_client_or_restore(session_id)
+        if not client:
+            raise ValueError("Client not found")
+
+        message_ids = list(dict.fromkeys(message_ids))
+        scheduler = self.get_scheduler(session_id)
+        messages = await scheduler.run(lambda: client.get_messages(chat_id, ids=message_ids))
+        by_id = {m.id: m for m in messages if m and m.media}
+        for message in by_id.values():
+            self._remember_media_message(session_id, chat_id, message)
+
+        async def load(message_id: int) -> Optional[bytes]:
+            message = by_id.get(message_id)
+            if not message:
+                return None
+            preview = await self.get_media_preview(session_id, message, size=size)
+            if not preview:
+                return None
+            async with aiofiles.open(preview[1], 'rb') as f:
+                return await f.read()
+
+        async for message_id, data in iter_completed(message_ids, load):
+            yield message_id, data if isinstance(data, bytes) else None
+
     async def get_profile_photo(self, session_id: str, entity_id: int) -> Optional[str]:
         """Get profile photo as base64"""
         client = await self.get_client_or_restore(session_id)
@@ -424,9 +1083,9 @@ class TelegramManager:
             return None
 
         try:
-            photo = await client.download_profile_photo(entity_id, bytes)
-            if photo:
-                return base64.b64encode(photo).decode()
+            avatar = await self._fetch_avatar(session_id, client, entity_id)
+            if avatar:
+                return base64.b64encode(avatar[1]).decode()
         except Exception as e:
             print(f"Error downloading photo for {entity_id}: {e}")
         return None
@@ -438,85 +1097,132 @@ class TelegramManager:
             return {}
 
         result = {}
+        async for entity_id, photo in self.iter_profile_photos(session_id, entity_ids):
+            if photo:
+                result[entity_id] = photo
+        return result
 
-        # Process in smaller batches to avoid rate limiting
-        batch_size = 5
-        for i in range(0, len(entity_ids), batch_size):
-            batch = entity_ids[i:i + batch_size]
-            tasks = []
-
-            for entity_id in batch:
-                tasks.append(self._get_single_photo(client, entity_id))
-
-            photos = await asyncio.gather(*tasks, return_exceptions=True)
-
-            for entity_id, photo in zip(batch, photos):
-                if isinstance(photo, str) and photo:
-                    result[entity_id] = photo
+    async def iter_profile_photos(self, session_id: str, entity_ids: List[int]) -> AsyncIterator[tuple[int, Optional[str]]]:
+        """Yield (entity_id, base64 photo or None) as each avatar resolves.
 
-            # Delay between batches
-            if i + batch_size < len(entity_ids):
-                await asyncio.sleep(0.2)
+        Concurrency and pacing come from the session's RequestScheduler, so
+        cached avatars return immediately and downloads run as fast as
+        Telegram allows.
+        """
+        client = await self.get_client_or_restore(session_id)
+        if not client:
+            return
 
-        return result
+        async for entity_id, photo in iter_completed(
+            dict.fromkeys(entity_ids),
+            lambda entity_id: self._get_single_photo(session_id, client, entity_id)
+        ):
+            yield entity_id, photo if isinstance(photo, str) else None
 
-    async def _get_single_photo(self, client: TelegramClient, entity_id: int) -> Optional[str]:
+    async def _get_single_photo(self, session_id: str, client: TelegramClient, entity_id: int) -> Optional[str]:
         """Helper to get single photo"""
         try:
-            photo = await client.download_profile_photo(entity_id, bytes)
-            if photo:
-                return base64.b64encode(photo).decode()
+            avatar = await self._fetch_avatar(session_id, client, entity_id)
+            if avatar:
+                return base64.b64encode(avatar[1]).decode()
         except Exception as e:
             pass
         return None
 
     # Event handlers setup
-    def setup_handlers(self, session_id: str, ws_callback: Callable):
-        """Setup event handlers for real-time updates"""
-        client = self.clients.get(session_id)
-        if not client:
-            raise ValueError("Client not found")
+    def _setup_dispatcher(self, session_id: str, client: TelegramClient):
+        """Register the client's update handlers, exactly once per client.
 
-        self.ws_callbacks[session_id] = ws_callback
+        Each update is formatted once and fanned out to the dialog cache, the
+        message store and the current WebSocket subscriber, if any; tabs
+        (re)connecting only swap the subscriber, never add handlers.
+        """
 
         @client.on(events.NewMessage)
-        async def new_message_handler(event):
-            if session_id in self.ws_callbacks:
-                msg_data = await self._format_message(client, event.message)
-                await self.ws_callbacks[session_id]("new_message", msg_data)
+        async def on_new_message(event):
+            msg = event.message
+            # Entities shipped with the update carry the sender's current photo
+            self._remember_entity(session_id, msg.sender)
+            self._remember_entity(session_id, msg.chat)
+            message = self._format_message(msg)
+            cache = self.dialog_caches.get(session_id)
+            if cache:
+                cache.apply_new_message(
+                    event.chat_id,
+                    msg.id,
+                    message["date"],
+                    self._message_preview(msg),
+                    msg.out
+                )
+            self._publish(session_id, "new_message", message)
+            try:
+                await self.message_store.add_new_message(session_id, event.chat_id, message)
+            except Exception as e:
+                print(f"Error storing new message: {e}")
 
         @client.on(events.MessageEdited)
-        async def edit_handler(event):
-            if session_id in self.ws_callbacks:
-                msg_data = await self._format_message(client, event.message)
-                await self.ws_callbacks[session_id]("message_edited", msg_data)
+        async def on_edit(event):
+            message = self._format_message(event.message)
+            cache = self.dialog_caches.get(session_id)
+            if cache:
+                cache.apply_edit(event.chat_id, event.message.id, self._message_preview(event.message))
+            self._publish(session_id, "message_edited", message)
+            try:
+                await self.message_store.update_message(session_id, event.chat_id, message)
+            except Exception as e:
+                print(f"Error storing edited message: {e}")
 
         @client.on(events.MessageDeleted)
-        async def delete_handler(event):
-            if session_id in self.ws_callbacks:
-                await self.ws_callbacks[session_id]("message_deleted", {
-                    "chat_id": event.chat_id,
-                    "message_ids": event.deleted_ids
-                })
+        async def on_delete(event):
+            cache = self.dialog_caches.get(session_id)
+            if cache:
+                cache.apply_delete(event.chat_id, event.deleted_ids)
+            self._publish(session_id, "message_deleted", {
+                "chat_id": event.chat_id,
+                "message_ids": event.deleted_ids
+            })
+            try:
+                await self.message_store.delete_messages(session_id, event.chat_id, event.deleted_ids)
+            except Exception as e:
+                print(f"Error deleting stored messages: {e}")
+
+        @client.on(events.MessageRead(inbox=True))
+        async def on_read(event):
+            cache = self.dialog_caches.get(session_id)
+            if cache:
+                cache.apply_read(event.chat_id, event.max_id)
 
         @client.on(events.UserUpdate)
-        async def user_update_handler(event):
+        async def on_user_update(event):
             if session_id in self.ws_callbacks:
-                await self.ws_callbacks[session_id]("user_update", {
+                self._publish(session_id, "user_update", {
                     "user_id": event.user_id,
                     "online": event.online,
                     "last_seen": event.last_seen.isoformat() if event.last_seen else None
                 })
 
         @client.on(events.ChatAction)
-        async def chat_action_handler(event):
+        async def on_chat_action(event):
             if session_id in self.ws_callbacks:
-                await self.ws_callbacks[session_id]("chat_action", {
+                self._publish(session_id, "chat_action", {
                     "chat_id": event.chat_id,
                     "user_id": event.user_id,
                     "action": str(event.action_message) if event.action_message else None
                 })
 
+    def _publish(self, session_id: str, event: str, data: dict):
+        """Hand an update to the session's WebSocket subscriber (queues only)"""
+        callback = self.ws_callbacks.get(session_id)
+        if callback:
+            callback(event, data)
+
+    def setup_handlers(self, session_id: str, ws_callback: Callable):
+        """Subscribe to the session's real-time updates; repeated calls replace the subscriber"""
+        if session_id not in self.clients:
+            raise ValueError("Client not found")
+
+        self.ws_callbacks[session_id] = ws_callback
+
     def remove_handlers(self, session_id: str):
         """Remove event handlers"""
         if session_id in self.ws_callbacks:
@@ -597,17 +1303,7 @@ class TelegramManager:
                 members_count = entity.participants_count
 
         last_msg = dialog.message
-        last_message_text = ""
-        if last_msg:
-            if last_msg.text:
-                last_message_text = last_msg.text[:100]
-            elif last_msg.media:
-                if isinstance(last_msg.media, MessageMediaPhoto):
-                    last_message_text = "📷 Photo"
-                elif isinstance(last_msg.media, MessageMediaDocument):
-                    last_message_text = "📎 Document"
-                else:
-                    last_message_text = "📎 Media"
+        last_message_text = self._message_preview(last_msg) if last_msg else ""
 
         return {
             "id": dialog.id,
@@ -618,49 +1314,79 @@ class TelegramManager:
             "members_count": members_count,
             "last_message": last_message_text,
             "last_message_date": last_msg.date.isoformat() if last_msg and last_msg.date else None,
+            "last_message_id": last_msg.id if last_msg else None,
             "unread_count": dialog.unread_count,
             "is_pinned": dialog.pinned,
             "is_muted": dialog.archived,
         }
 
-    async def _format_message(self, client: TelegramClient, message) -> dict:
-        """Format Telethon Message to dict"""
+    def _message_preview(self, message) -> str:
+        """Short last-message text shown in the dialog list"""
+        if message.text:
+            return message.text[:100]
+        if message.media:
+            if isinstance(message.media, MessageMediaPhoto):
+                return "📷 Photo"
+            if isinstance(message.media, MessageMediaDocument):
+                return "📎 Document"
+            return "📎 Media"
+        return ""
+
+    def format_messages(self, messages) -> List[dict]:
+        """Format a batch of Telethon Messages to dicts.
+
+        Sender names are resolved once per batch, since a page usually comes
+        from a handful of senders.
+        """
+        senders: Dict[int, tuple] = {}
+        format_message = self._format_message
+        return [format_message(m, senders) for m in messages]
+
+    @staticmethod
+    def _classify_media(media) -> tuple:
+        """(media_type, media_info) for a message's media"""
+        media_type = MEDIA_TYPES.get(type(media))
+        if media_type or type(media) is not MessageMediaDocument:
+            return media_type, None
+        doc = media.document
+        if not doc:
+            return None, None
+        file_name = None
+        for attr in doc.attributes:
+            classify = DOCUMENT_ATTRIBUTE_TYPES.get(type(attr))
+            if classify:
+                return classify(attr), None
+            if file_name is None and type(attr) is DocumentAttributeFilename:
+                file_name = attr.file_name
+        return "document", file_name
+
+    @staticmethod
+    def _sender_info(message) -> tuple:
+        """(sender_id, sender_name) of a message"""
+        sender = message.sender
+        if not sender:
+            return None, ""
+        if type(sender) is User:
+            return message.sender_id, f"{sender.first_name or ''} {sender.last_name or ''}".strip()
+        return message.sender_id, getattr(sender, 'title', 'Unknown')
+
+    def _format_message(self, message, senders: dict = None) -> dict:
+        """Format Telethon Message to dict, optionally sharing sender lookups across a batch"""
         if not message:
             return None
 
-        sender_name = ""
-        sender_id = None
-        if message.sender:
-            sender_id = message.sender_id
-            if isinstance(message.sender, User):
-                sender_name = f"{message.sender.first_name or ''} {message.sender.last_name or ''}".strip()
-            else:
-                sender_name = getattr(message.sender, 'title', 'Unknown')
+        if senders is None:
+            sender_id, sender_name = self._sender_info(message)
+        else:
+            key = message.sender_id
+            sender = senders.get(key)
+            if sender is None:
+                sender = senders[key] = self._sender_info(message)
+            sender_id, sender_name = sender
 
-        media_type = None
-        media_info = None
+        media_type = media_info = None
         if message.media:
-            if isinstance(message.media, MessageMediaPhoto):
-                media_type = "photo"
-            elif isinstance(message.media, MessageMediaDocument):
-                doc = message.media.document
-                if doc:
-                    for attr in doc.attributes:
-                        if isinstance(attr, DocumentAttributeSticker):
-                            media_type = "sticker"
-                            break
-                        elif isinstance(attr, DocumentAttributeAudio):
-                            media_type = "voice" if attr.voice else "audio"
-                            break
-                        elif isinstance(attr, DocumentAttributeVideo):
-                            media_type = "video" if not attr.round_message else "video_note"
-                            break
-                    if not media_type:
-                        media_type = "document"
-                        for attr in doc.attributes:
-                            if isinstance(attr, DocumentAttributeFilename):
-                                media_info = attr.file_name
-                                break
+            media_type, media_info = self._classify_media(message.media)
 
         return {
             "id": message.id,
@@ -668,10 +1394,11 @@ class TelegramManager:
             "sender_id": sender_id,
             "sender_name": sender_name,
             "text": message.text or "",
-            "date": message.date.isoformat() if message.date else None,
+            "date": _isoformat(message.date),
             "is_outgoing": message.out,
-            "reply_to_msg_id": message.reply_to_msg_id if message.reply_to else None,
+            "reply_to_msg_id": message.reply_to_msg_id,
             "media_type": media_type,
+            "media_url": None,
             "media_info": media_info,
             "is_edited": message.edit_date is not None,
             "views": message.views,
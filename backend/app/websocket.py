@@ -1,73 +1,341 @@
 from fastapi import WebSocket, WebSocketDisconnect
-from typing import Dict, Set
+from typing import Callable, Deque, Dict, Optional, Set, Union
+from collections import deque
 import json
 import asyncio
+import time
+import orjson
+from app.config import get_settings
 from app.telegram_client import telegram_manager
+from app.metrics import WS_CONNECTIONS, WS_RESUMES
+
+try:
+    import msgpack
+except ImportError:  # optional: only needed for /ws?encoding=msgpack
+    msgpack = None
+
+OVERFLOW_POLICIES = ("drop_oldest", "coalesce", "disconnect")
+# High-frequency state updates merged per session within the coalescing window.
+# chat_action is not one of them: joins, leaves, pins and title changes are distinct events.
+COALESCED_EVENTS = ("user_update", "message_edited")
+ENCODINGS = ("json", "msgpack")
+
+
+def _coalesce_key(event: str, data: dict) -> Optional[tuple]:
+    """Frames with the same key carry state where only the latest one matters"""
+    if not isinstance(data, dict):
+        return None
+    if event == "user_update":
+        # Typing updates carry no status (online is None); keep them apart so they
+        # never replace a presence change
+        return (event, data.get("user_id"), data.get("online") is None)
+    if event == "message_edited":
+        return (event, data.get("chat_id"), data.get("id"))
+    if event == "upload_progress":
+        return (event, data.get("upload_id"))
+    return None
+
+
+class Envelope:
+    """An outbound event, encoded at most once per wire format and shared by every socket"""
+
+    __slots__ = ("event", "data", "key", "seq", "_encoded")
+
+    def __init__(self, event: str, data):
+        self.event = event
+        self.data = data
+        self.key = _coalesce_key(event, data)
+        # Position in the session's stream; None for per-socket replies (pong, resync_required)
+        self.seq: Optional[int] = None
+        self._encoded: Dict[str, Union[str, bytes]] = {}
+
+    def encode(self, encoding: str) -> Union[str, bytes]:
+        """Text frame for JSON, binary frame for MessagePack"""
+        frame = self._encoded.get(encoding)
+        if frame is None:
+            message = {"event": self.event, "data": self.data}
+            if self.seq is not None:
+                message["seq"] = self.seq
+            if encoding == "msgpack":
+                frame = msgpack.packb(message, use_bin_type=True)
+            else:
+                frame = orjson.dumps(message).decode()
+            self._encoded[encoding] = frame
+        return frame
+
+
+class Connection:
+    """A WebSocket with its own bounded outbound queue, drained by a writer task.
+
+    Senders only enqueue, so a slow socket never blocks the others or the
+    Telethon handler that produced the event.
+    """
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        session_id: str,
+        encoding: str,
+        max_queue: int,
+        overflow: str,
+        on_error: Callable[["Connection"], None]
+    ):
+        self.websocket = websocket
+        self.session_id = session_id
+        self.encoding = encoding
+        self.max_queue = max_queue
+        self.overflow = overflow
+        self.on_error = on_error
+        self.queue: Deque[Envelope] = deque()
+        self.dropped = 0
+        self._ready = asyncio.Event()
+        self._writer = asyncio.create_task(self._write_loop())
+
+    def send(self, envelope: Envelope) -> bool:
+        """Queue an event; False means the queue overflowed under the disconnect policy"""
+        if len(self.queue) >= self.max_queue:
+            if self.overflow == "disconnect":
+                return False
+            if not (self.overflow == "coalesce" and envelope.key is not None and self._drop_key(envelope.key)):
+                self.queue.popleft()
+            self.dropped += 1
+        self.queue.append(envelope)
+        self._ready.set()
+        return True
+
+    def _drop_key(self, key: tuple) -> bool:
+        """Remove a queued event superseded by a newer one with the same key"""
+        for index, queued in enumerate(self.queue):
+            if queued.key == key:
+                del self.queue[index]
+                return True
+        return False
+
+    async def _write_loop(self):
+        try:
+            while True:
+                if not self.queue:
+                    self._ready.clear()
+                    await self._ready.wait()
+                    continue
+                frame = self.queue.popleft().encode(self.encoding)
+                if isinstance(frame, bytes):
+                    await self.websocket.send_bytes(frame)
+                else:
+                    await self.websocket.send_text(frame)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self.on_error(self)
+
+    def stop(self):
+        """Stop writing; queued frames are discarded"""
+        self._writer.cancel()
+        self.queue.clear()
+
+    async def close(self, code: int = 1000):
+        self.stop()
+        try:
+            await self.websocket.close(code=code)
+        except Exception:
+            pass
 
 
 class ConnectionManager:
     def __init__(self):
         # session_id -> set of websockets
         self.active_connections: Dict[str, Set[WebSocket]] = {}
-        # websocket -> session_id
-        self.websocket_sessions: Dict[WebSocket, str] = {}
-
-    async def connect(self, websocket: WebSocket, session_id: str):
-        """Connect a websocket for a session"""
+        # websocket -> its outbound queue and session
+        self.connections: Dict[WebSocket, Connection] = {}
+        settings = get_settings()
+        if settings.ws_overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown WebSocket overflow policy: {settings.ws_overflow_policy}")
+        self.max_queue = settings.ws_queue_size
+        self.overflow = settings.ws_overflow_policy
+        self.coalesce_window = settings.ws_coalesce_window
+        self.replay_size = settings.ws_replay_buffer
+        self.resume_grace = settings.ws_resume_grace
+        # session_id -> coalesce key -> latest (event, data), in arrival order
+        self._pending: Dict[str, Dict[tuple, tuple]] = {}
+        self._flush_timers: Dict[str, asyncio.TimerHandle] = {}
+        # session_id -> last seq sent, and the most recent sequenced events.
+        # A session's stream lives while it has sockets, plus the resume grace period.
+        self._seq: Dict[str, int] = {}
+        self._replay: Dict[str, Deque[Envelope]] = {}
+        self._expiry: Dict[str, asyncio.TimerHandle] = {}
+        WS_CONNECTIONS.set_function(lambda: len(self.connections))
+
+    async def connect(
+        self,
+        websocket: WebSocket,
+        session_id: str,
+        encoding: str = "json",
+        last_seq: Optional[int] = None
+    ):
+        """Connect a websocket for a session, replaying events missed since `last_seq`"""
         await websocket.accept()
 
+        timer = self._expiry.pop(session_id, None)
+        if timer:
+            timer.cancel()
+        if session_id not in self._replay:
+            # Start above any seq an earlier stream (or process) handed out, so a
+            # stale last_seq shows up as a gap instead of matching the wrong events
+            self._seq[session_id] = time.time_ns() // 1000
+            self._replay[session_id] = deque(maxlen=self.replay_size)
+
         if session_id not in self.active_connections:
             self.active_connections[session_id] = set()
 
         self.active_connections[session_id].add(websocket)
-        self.websocket_sessions[websocket] = session_id
-
-        # Setup Telegram event handlers if client exists (try to auto-restore)
+        connection = Connection(
+            websocket, session_id, encoding, self.max_queue, self.overflow, self._on_write_error
+        )
+        self.connections[websocket] = connection
+        if last_seq is not None:
+            self._resume(connection, last_seq)
+
+        # Subscribe to the client's update dispatcher if it exists (try to auto-restore)
         client = await telegram_manager.get_client_or_restore(session_id)
         if client:
             telegram_manager.setup_handlers(session_id, self._create_callback(session_id))
 
     def disconnect(self, websocket: WebSocket):
         """Disconnect a websocket"""
-        session_id = self.websocket_sessions.get(websocket)
-        if session_id:
+        connection = self.connections.pop(websocket, None)
+        if connection:
+            connection.stop()
+            session_id = connection.session_id
             if session_id in self.active_connections:
                 self.active_connections[session_id].discard(websocket)
                 if not self.active_connections[session_id]:
                     del self.active_connections[session_id]
-                    telegram_manager.remove_handlers(session_id)
-            del self.websocket_sessions[websocket]
+                    # Keep buffering for a while so a reconnect can resume the stream
+                    if self.resume_grace > 0:
+                        self._expiry[session_id] = asyncio.get_running_loop().call_later(
+                            self.resume_grace, self._expire, session_id
+                        )
+                    else:
+                        self._expire(session_id)
+
+    def _expire(self, session_id: str):
+        """Close a session's stream once its grace period passes without a reconnect"""
+        self._expiry.pop(session_id, None)
+        if session_id in self.active_connections:
+            return
+        self._discard_pending(session_id)
+        self._seq.pop(session_id, None)
+        self._replay.pop(session_id, None)
+        telegram_manager.remove_handlers(session_id)
+
+    def _resume(self, connection: Connection, last_seq: int):
+        """Queue the events a reconnecting client missed, or ask it to resync.
+
+        Replay needs every event after last_seq still buffered and small
+        enough to fit the socket's queue; otherwise the client reloads.
+        """
+        session_id = connection.session_id
+        seq = self._seq[session_id]
+        missed = seq - last_seq
+        if missed == 0:
+            return
+        buffered = self._replay[session_id]
+        if 0 < missed <= min(len(buffered), self.max_queue):
+            for envelope in list(buffered)[-missed:]:
+                connection.send(envelope)
+            WS_RESUMES.labels("replayed").inc()
+        else:
+            connection.send(Envelope("resync_required", {"seq": seq}))
+            WS_RESUMES.labels("resync").inc()
+
+    def _on_write_error(self, connection: Connection):
+        self.disconnect(connection.websocket)
+
+    def _drop_slow(self, connection: Connection):
+        """Disconnect a socket whose queue overflowed; the client reconnects and reloads"""
+        print(f"WebSocket queue overflow for session {connection.session_id}, disconnecting")
+        self.disconnect(connection.websocket)
+        asyncio.create_task(connection.close(code=1013))
+
+    def publish(self, session_id: str, event: str, data: dict):
+        """Queue an event for every websocket of a session without waiting for writes.
+
+        Presence and edits are held for the coalescing window
+        so repeated updates of the same user/message collapse into the
+        latest one; any other event flushes them first to keep ordering.
+        The event is encoded once per wire format, however many tabs are open,
+        and keeps flowing into the replay buffer during the resume grace period.
+        """
+        if session_id not in self._replay:
+            return
+        if self.coalesce_window > 0 and event in COALESCED_EVENTS:
+            key = _coalesce_key(event, data)
+            if key is not None:
+                pending = self._pending.setdefault(session_id, {})
+                pending.pop(key, None)
+                pending[key] = (event, data)
+                if session_id not in self._flush_timers:
+                    self._flush_timers[session_id] = asyncio.get_running_loop().call_later(
+                        self.coalesce_window, self._flush, session_id
+                    )
+                return
+
+        self._flush(session_id)
+        self._send(session_id, Envelope(event, data))
+
+    def _flush(self, session_id: str):
+        """Send the session's coalesced updates, several at once as a `batch` frame"""
+        timer = self._flush_timers.pop(session_id, None)
+        if timer:
+            timer.cancel()
+        pending = self._pending.pop(session_id, None)
+        if not pending:
+            return
+        updates = list(pending.values())
+        if len(updates) == 1:
+            envelope = Envelope(*updates[0])
+        else:
+            envelope = Envelope("batch", [{"event": event, "data": data} for event, data in updates])
+        self._send(session_id, envelope)
+
+    def _discard_pending(self, session_id: str):
+        timer = self._flush_timers.pop(session_id, None)
+        if timer:
+            timer.cancel()
+        self._pending.pop(session_id, None)
+
+    def _send(self, session_id: str, envelope: Envelope):
+        """Number the event, keep it for replay and queue it on the session's sockets"""
+        envelope.seq = self._seq[session_id] = self._seq[session_id] + 1
+        self._replay[session_id].append(envelope)
+        websockets = self.active_connections.get(session_id)
+        if websockets:
+            self._fan_out(list(websockets), envelope)
+
+    def _fan_out(self, websockets, envelope: Envelope):
+        for websocket in websockets:
+            connection = self.connections.get(websocket)
+            if connection and not connection.send(envelope):
+                self._drop_slow(connection)
 
     async def send_to_session(self, session_id: str, event: str, data: dict):
         """Send message to all websockets of a session"""
-        if session_id in self.active_connections:
-            message = json.dumps({"event": event, "data": data})
-            dead_connections = set()
+        self.publish(session_id, event, data)
 
-            for websocket in self.active_connections[session_id]:
-                try:
-                    await websocket.send_text(message)
-                except:
-                    dead_connections.add(websocket)
-
-            # Cleanup dead connections
-            for ws in dead_connections:
-                self.disconnect(ws)
+    def send_to_socket(self, websocket: WebSocket, event: str, data: dict):
+        """Queue an event for a single websocket"""
+        connection = self.connections.get(websocket)
+        if connection and not connection.send(Envelope(event, data)):
+            self._drop_slow(connection)
 
     async def broadcast(self, event: str, data: dict):
         """Broadcast to all connected websockets"""
-        message = json.dumps({"event": event, "data": data})
-        for session_id, connections in self.active_connections.items():
-            for websocket in connections:
-                try:
-                    await websocket.send_text(message)
-                except:
-                    pass
+        self._fan_out(list(self.connections), Envelope(event, data))
 
     def _create_callback(self, session_id: str):
-        """Create callback for Telegram events"""
-        async def callback(event: str, data: dict):
-            await self.send_to_session(session_id, event, data)
+        """Create callback for Telegram events; it only queues, never awaits network writes"""
+        def callback(event: str, data: dict):
+            self.publish(session_id, event, data)
         return callback
 
 
@@ -75,14 +343,33 @@ class ConnectionManager:
 manager = ConnectionManager()
 
 
-async def websocket_endpoint(websocket: WebSocket, session_id: str):
+async def _receive(websocket: WebSocket) -> dict:
+    """Next client event: JSON text frames, or MessagePack binary frames"""
+    message = await websocket.receive()
+    if message["type"] == "websocket.disconnect":
+        raise WebSocketDisconnect(message.get("code", 1000))
+    if message.get("bytes") is not None and msgpack is not None:
+        return msgpack.unpackb(message["bytes"], raw=False)
+    return json.loads(message.get("text") or message.get("bytes") or "{}")
+
+
+async def websocket_endpoint(
+    websocket: WebSocket,
+    session_id: str,
+    encoding: str = "json",
+    last_seq: Optional[int] = None
+):
     """Main WebSocket endpoint handler"""
-    await manager.connect(websocket, session_id)
+    if encoding not in ENCODINGS or (encoding == "msgpack" and msgpack is None):
+        # Unsupported (or not installed) encoding: refuse the handshake
+        await websocket.close(code=1003)
+        return
+
+    await manager.connect(websocket, session_id, encoding, last_seq)
 
     try:
         while True:
-            data = await websocket.receive_text()
-            message = json.loads(data)
+            message = await _receive(websocket)
             event = message.get("event")
             payload = message.get("data", {})
 
@@ -98,7 +385,7 @@ async def websocket_endpoint(websocket: WebSocket, session_id: str):
             elif event == "start_typing":
                 await handle_typing(session_id, payload)
             elif event == "ping":
-                await websocket.send_text(json.dumps({"event": "pong", "data": {}}))
+                manager.send_to_socket(websocket, "pong", {})
 
     except WebSocketDisconnect:
         manager.disconnect(websocket)
@@ -0,0 +1,125 @@
+"""Benchmark message serialization: formatting and JSON encoding of a page.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_format [--messages 200] [--rounds 200]
+"""
+from datetime import datetime, timezone
+from types import SimpleNamespace
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+# Importing the app creates the global manager; keep its files out of the tree
+os.environ.setdefault("SESSION_STORE", "json")
+os.chdir(tempfile.mkdtemp(prefix="bench-format-"))
+
+import orjson
+from pydantic import TypeAdapter
+from telethon.extensions import markdown
+from telethon.tl.types import (
+    Message, PeerUser, User, MessageEntityBold,
+    MessageMediaPhoto, MessageMediaDocument, Photo, Document,
+    DocumentAttributeFilename, DocumentAttributeAudio, DocumentAttributeVideo
+)
+
+from app.telegram_client import telegram_manager
+from app.models.schemas import MessagesResponse
+
+CLIENT = SimpleNamespace(parse_mode=markdown)
+DATE = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def _document(*attributes):
+    return Document(
+        id=1, access_hash=2, file_reference=b"", date=DATE, mime_type="application/octet-stream",
+        size=1024, dc_id=2, attributes=list(attributes)
+    )
+
+
+def _media(i: int):
+    kind = i % 5
+    if kind == 1:
+        return MessageMediaPhoto(photo=Photo(
+            id=i, access_hash=2, file_reference=b"", date=DATE, sizes=[], dc_id=2
+        ))
+    if kind == 2:
+        return MessageMediaDocument(document=_document(DocumentAttributeFilename("report.pdf")))
+    if kind == 3:
+        return MessageMediaDocument(document=_document(DocumentAttributeAudio(duration=3, voice=True)))
+    if kind == 4:
+        return MessageMediaDocument(document=_document(
+            DocumentAttributeVideo(duration=10, w=640, h=480), DocumentAttributeFilename("clip.mp4")
+        ))
+    return None
+
+
+def make_messages(count: int) -> list:
+    sender = User(id=42, first_name="Ada", last_name="Lovelace")
+    messages = []
+    for i in range(1, count + 1):
+        m = Message(
+            id=i, peer_id=PeerUser(42), date=DATE, out=i % 2 == 0,
+            message=f"Message number {i} with some text", media=_media(i),
+            entities=[MessageEntityBold(offset=0, length=7)] if i % 3 == 0 else None
+        )
+        m._client = CLIENT
+        m._sender = sender
+        messages.append(m)
+    return messages
+
+
+def bench(label: str, fn, rounds: int, count: int):
+    fn()
+    started = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    elapsed = time.perf_counter() - started
+    per_page = elapsed / rounds * 1e6
+    print(f"{label:<40} {per_page:10.1f} us/page {per_page / count:8.2f} us/msg")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    messages = make_messages(args.messages)
+    formatted = telegram_manager.format_messages(messages)
+    body = {"messages": formatted, "chat_id": 42}
+    adapter = TypeAdapter(MessagesResponse)
+
+    async def format_with_coroutines():
+        # Former path: one awaited coroutine per message
+        async def one(m):
+            return telegram_manager._format_message(m)
+        return [await one(m) for m in messages]
+
+    # The routes send orjson output under their response_model, so it must be
+    # exactly what serialising through the model would produce
+    if orjson.loads(orjson.dumps(body)) != orjson.loads(adapter.dump_json(adapter.validate_python(body))):
+        sys.exit("formatted messages don't match the MessagesResponse schema")
+
+    print(f"{args.messages} messages, {args.rounds} rounds")
+    bench("format (batched, sync)", lambda: telegram_manager.format_messages(messages),
+          args.rounds, args.messages)
+    loop = asyncio.new_event_loop()
+    bench("format (coroutine per message)", lambda: loop.run_until_complete(format_with_coroutines()),
+          args.rounds, args.messages)
+    loop.close()
+    bench("encode (pydantic validate + dump)", lambda: adapter.dump_json(adapter.validate_python(body)),
+          args.rounds, args.messages)
+    bench("encode (orjson)", lambda: orjson.dumps(body), args.rounds, args.messages)
+    bench("format + orjson (route path)", lambda: orjson.dumps(
+        {"messages": telegram_manager.format_messages(messages), "chat_id": 42}
+    ), args.rounds, args.messages)
+
+
+if __name__ == "__main__":
+    main()
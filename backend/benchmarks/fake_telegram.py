@@ -0,0 +1,347 @@
+"""In-process fake of Telethon's TelegramClient for benchmarks.
+
+A FakeWorld holds synthetic users, dialogs and message history shared by
+every client it creates. Each RPC sleeps for the configured latency and can
+fail with FloodWaitError at a configurable rate. Clients keep their event
+handlers and deliver synthetic updates through `emit`, the same way
+Telethon calls handlers registered with `client.on`.
+"""
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Optional
+import asyncio
+import inspect
+import os
+import random
+
+from telethon import events
+from telethon.errors import FloodWaitError
+from telethon.extensions import markdown
+from telethon.tl.types import (
+    Message, PeerUser, User, UserProfilePhoto, UserStatusRecently, UserStatusOnline,
+    InputPeerUser, InputFile, MessageMediaPhoto, MessageMediaDocument, Photo, PhotoSize,
+    Document, DocumentAttributeFilename, DocumentAttributeVideo
+)
+
+EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+UPLOAD_PART_SIZE = 512 * 1024
+
+
+class FakeWorld:
+    """Synthetic account data plus latency/FloodWait settings for fake clients"""
+
+    def __init__(
+        self,
+        dialogs: int = 200,
+        messages_per_chat: int = 1000,
+        avatar_bytes: int = 8 * 1024,
+        media_bytes: int = 256 * 1024,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        flood_rate: float = 0.0,
+        flood_seconds: int = 1,
+        seed: int = 0
+    ):
+        self.messages_per_chat = messages_per_chat
+        self.avatar_bytes = avatar_bytes
+        self.media_bytes = media_bytes
+        self.latency = latency
+        self.jitter = jitter
+        self.flood_rate = flood_rate
+        self.flood_seconds = flood_seconds
+        self.random = random.Random(seed)
+        self.me = User(id=1, first_name="Bench", last_name="User", username="bench", phone="000")
+        self.users = [
+            User(
+                id=1000 + i,
+                access_hash=i,
+                first_name=f"User{i}",
+                last_name="Fake",
+                username=f"user{i}",
+                photo=UserProfilePhoto(photo_id=5000 + i, dc_id=2),
+                status=UserStatusRecently()
+            )
+            for i in range(dialogs)
+        ]
+        self.users_by_id = {user.id: user for user in self.users}
+        self.clients: List["FakeTelegramClient"] = []
+        self.rpc_counts: Dict[str, int] = {}
+        self.flood_waits = 0
+
+    def create_client(self, session=None, api_id=0, api_hash="", **kwargs) -> "FakeTelegramClient":
+        """Drop-in replacement for the TelegramClient constructor"""
+        client = FakeTelegramClient(self, session)
+        self.clients.append(client)
+        return client
+
+    def install(self):
+        """Make the app create fake clients instead of connecting to Telegram"""
+        import app.telegram_client
+        app.telegram_client.TelegramClient = self.create_client
+
+    async def rpc(self, name: str):
+        """Simulate one round-trip: count it, wait, maybe raise FloodWait"""
+        self.rpc_counts[name] = self.rpc_counts.get(name, 0) + 1
+        delay = self.latency + self.random.uniform(0, self.jitter)
+        if delay:
+            await asyncio.sleep(delay)
+        if self.flood_rate and self.random.random() < self.flood_rate:
+            self.flood_waits += 1
+            raise FloodWaitError(request=None, capture=self.flood_seconds)
+
+    def message(self, client: "FakeTelegramClient", chat_id: int, message_id: int, text: str = None) -> Message:
+        """Deterministic synthetic message `message_id` of a private chat"""
+        user = self.users_by_id.get(chat_id, self.users[0])
+        outgoing = message_id % 3 == 0
+        message = Message(
+            id=message_id,
+            peer_id=PeerUser(chat_id),
+            from_id=PeerUser(self.me.id if outgoing else chat_id),
+            date=EPOCH + timedelta(minutes=message_id),
+            message=text if text is not None else f"Message {message_id} in chat {chat_id}",
+            out=outgoing,
+            media=self._media(message_id)
+        )
+        message._client = client
+        message._sender = self.me if outgoing else user
+        return message
+
+    def _media(self, message_id: int):
+        if message_id % 10 == 1:
+            return MessageMediaPhoto(photo=Photo(
+                id=message_id, access_hash=1, file_reference=b"", date=EPOCH, dc_id=2,
+                sizes=[PhotoSize(type="m", w=320, h=240, size=16 * 1024),
+                       PhotoSize(type="y", w=1280, h=960, size=self.media_bytes)]
+            ))
+        if message_id % 10 == 5:
+            return MessageMediaDocument(document=Document(
+                id=message_id, access_hash=1, file_reference=b"", date=EPOCH,
+                mime_type="video/mp4", size=self.media_bytes, dc_id=2,
+                attributes=[DocumentAttributeVideo(duration=10, w=640, h=480),
+                            DocumentAttributeFilename("clip.mp4")]
+            ))
+        return None
+
+
+class FakeTelegramClient:
+    """Subset of TelegramClient used by the app, backed by a FakeWorld"""
+
+    def __init__(self, world: FakeWorld, session=None):
+        self.world = world
+        self.session = session
+        self.parse_mode = markdown
+        self.connected = False
+        self._handlers: List[tuple] = []
+        self._next_id: Dict[int, int] = {}
+
+    # Connection
+    async def connect(self):
+        await self.world.rpc("connect")
+        self.connected = True
+
+    async def disconnect(self):
+        self.connected = False
+
+    async def is_user_authorized(self) -> bool:
+        return True
+
+    async def get_me(self):
+        await self.world.rpc("get_me")
+        return self.world.me
+
+    async def log_out(self):
+        self.connected = False
+        return True
+
+    async def __call__(self, request):
+        await self.world.rpc(type(request).__name__)
+        return None
+
+    # Event handlers
+    def on(self, event):
+        def decorator(callback):
+            self.add_event_handler(callback, event)
+            return callback
+        return decorator
+
+    def add_event_handler(self, callback: Callable, event=None):
+        builder = event if isinstance(event, type) else type(event)
+        self._handlers.append((callback, builder))
+
+    def remove_event_handler(self, callback: Callable, event=None) -> int:
+        before = len(self._handlers)
+        self._handlers = [
+            (cb, builder) for cb, builder in self._handlers
+            if cb is not callback or (event is not None and builder is not event)
+        ]
+        return before - len(self._handlers)
+
+    def list_event_handlers(self) -> List[tuple]:
+        return list(self._handlers)
+
+    async def emit(self, event):
+        """Deliver an update to every matching handler, like Telethon's dispatcher"""
+        for callback, builder in list(self._handlers):
+            if isinstance(event, builder.Event):
+                await callback(event)
+
+    def new_message_event(self, chat_id: int, text: str) -> events.NewMessage.Event:
+        message_id = self._next_id.get(chat_id, self.world.messages_per_chat) + 1
+        self._next_id[chat_id] = message_id
+        message = self.world.message(self, chat_id, message_id, text)
+        return events.NewMessage.Event(message)
+
+    def edit_event(self, chat_id: int, message_id: int, text: str) -> events.MessageEdited.Event:
+        message = self.world.message(self, chat_id, message_id, text)
+        message.edit_date = message.date
+        return events.MessageEdited.Event(message)
+
+    def delete_event(self, chat_id: int, message_ids: List[int]) -> events.MessageDeleted.Event:
+        return events.MessageDeleted.Event(message_ids, None)
+
+    def user_update_event(self, user_id: int, online: bool = True) -> events.UserUpdate.Event:
+        status = UserStatusOnline(expires=EPOCH) if online else UserStatusRecently()
+        return events.UserUpdate.Event(PeerUser(user_id), status=status)
+
+    # Dialogs and entities
+    def _dialog(self, user: User):
+        last = self.world.message(self, user.id, self.world.messages_per_chat)
+        return SimpleNamespace(
+            id=user.id,
+            entity=user,
+            name=f"{user.first_name} {user.last_name}",
+            message=last,
+            date=last.date,
+            unread_count=user.id % 5,
+            pinned=user.id % 50 == 0,
+            archived=False
+        )
+
+    async def get_dialogs(self, limit=None, offset_date=None, offset_id=0, offset_peer=None, **kwargs):
+        await self.world.rpc("get_dialogs")
+        users = self.world.users
+        if offset_peer is not None and getattr(offset_peer, "user_id", None) in self.world.users_by_id:
+            start = users.index(self.world.users_by_id[offset_peer.user_id]) + 1
+            users = users[start:]
+        if limit is not None:
+            users = users[:limit]
+        return [self._dialog(user) for user in users]
+
+    async def get_input_entity(self, peer):
+        user = self.world.users_by_id.get(peer)
+        if user is None:
+            raise ValueError(f"Could not find the input entity for {peer}")
+        return InputPeerUser(user.id, user.access_hash)
+
+    async def get_entity(self, entity_id):
+        await self.world.rpc("get_entity")
+        user = self.world.users_by_id.get(entity_id)
+        if user is None:
+            raise ValueError(f"Could not find the entity for {entity_id}")
+        return user
+
+    async def download_profile_photo(self, entity, file=None, **kwargs):
+        await self.world.rpc("download_profile_photo")
+        return os.urandom(self.world.avatar_bytes)
+
+    # Messages
+    def _history(self, chat_id: int, limit: Optional[int], offset_id: int) -> List[Message]:
+        top = (offset_id or self.world.messages_per_chat + 1) - 1
+        bottom = max(top - (limit if limit is not None else top), 0)
+        return [self.world.message(self, chat_id, i) for i in range(top, bottom, -1)]
+
+    async def get_messages(self, entity, limit=None, offset_id=0, ids=None, search=None, **kwargs):
+        await self.world.rpc("get_messages")
+        if ids is not None:
+            if isinstance(ids, int):
+                return self.world.message(self, entity, ids)
+            return [self.world.message(self, entity, i) for i in ids]
+        if search is not None:
+            chats = [entity] if entity else [u.id for u in self.world.users[:10]]
+            found = [m for chat in chats for m in self._history(chat, 100, 0) if search in m.message]
+            return found[:limit]
+        return self._history(entity, 1 if limit is None else limit, offset_id)
+
+    async def iter_messages(self, entity, limit=None, offset_id=0, **kwargs):
+        await self.world.rpc("get_messages")
+        for message in self._history(entity, limit, offset_id):
+            yield message
+
+    async def send_message(self, entity, message, reply_to=None, **kwargs):
+        await self.world.rpc("send_message")
+        event = self.new_message_event(entity, message)
+        event.message.out = True
+        event.message._sender = self.world.me
+        await self.emit(event)
+        return event.message
+
+    async def edit_message(self, entity, message=None, text=None, **kwargs):
+        await self.world.rpc("edit_message")
+        return self.world.message(self, entity, message, text)
+
+    async def delete_messages(self, entity, message_ids, **kwargs):
+        await self.world.rpc("delete_messages")
+        return []
+
+    async def forward_messages(self, entity, messages, from_peer=None, **kwargs):
+        await self.world.rpc("forward_messages")
+        ids = messages if isinstance(messages, list) else [messages]
+        return [self.new_message_event(entity, f"Forwarded {i}").message for i in ids]
+
+    async def send_read_acknowledge(self, entity, message=None, max_id=None, **kwargs):
+        await self.world.rpc("send_read_acknowledge")
+        return True
+
+    # Files
+    async def upload_file(self, file, file_size=None, file_name=None, progress_callback=None, **kwargs):
+        """Read the stream part by part like Telethon, reporting progress"""
+        sent = 0
+        parts = 0
+        while True:
+            chunk = file.read(UPLOAD_PART_SIZE)
+            if inspect.isawaitable(chunk):
+                chunk = await chunk
+            if not chunk:
+                break
+            await self.world.rpc("upload.saveFilePart")
+            sent += len(chunk)
+            parts += 1
+            if progress_callback:
+                result = progress_callback(sent, file_size)
+                if inspect.isawaitable(result):
+                    await result
+        return InputFile(id=self.world.random.getrandbits(63), parts=parts, name=file_name or "file", md5_checksum="")
+
+    async def send_file(self, entity, file, caption=None, reply_to=None, progress_callback=None, **kwargs):
+        await self.world.rpc("send_file")
+        name = getattr(file, "name", None) or "file"
+        event = self.new_message_event(entity, caption or "")
+        event.message.out = True
+        event.message._sender = self.world.me
+        event.message.media = MessageMediaDocument(document=Document(
+            id=event.message.id, access_hash=1, file_reference=b"", date=EPOCH,
+            mime_type="application/octet-stream", size=0, dc_id=2,
+            attributes=[DocumentAttributeFilename(name)]
+        ))
+        await self.emit(event)
+        return event.message
+
+    async def download_media(self, message, file=None, thumb=None, **kwargs):
+        await self.world.rpc("download_media")
+        data = os.urandom(16 * 1024 if thumb is not None else self.world.media_bytes)
+        if file is bytes:
+            return data
+        path = file if isinstance(file, str) else "media.bin"
+        with open(path, "wb") as f:
+            f.write(data)
+        return path
+
+    async def iter_download(self, file, offset=0, limit=None, request_size=128 * 1024, **kwargs):
+        remaining = self.world.media_bytes - offset
+        while remaining > 0 and (limit is None or limit > 0):
+            await self.world.rpc("upload.getFile")
+            chunk = os.urandom(min(request_size, remaining))
+            remaining -= len(chunk)
+            if limit is not None:
+                limit -= 1
+            yield chunk
@@ -0,0 +1,242 @@
+"""Load test the real FastAPI app against an in-process fake Telegram backend.
+
+HTTP scenarios go through httpx's ASGI transport and WebSocket fan-out goes
+through Starlette's TestClient, so nothing touches the network. Run from
+the backend directory:
+
+    python -m benchmarks.load_test --sessions 4 --concurrency 16 --latency 0.02
+    python -m benchmarks.load_test --scenarios fanout --sockets 8 --events 1000
+"""
+from typing import Awaitable, Callable, Dict, List
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+# The app writes sessions, caches and databases relative to the working directory
+os.environ.setdefault("SESSION_STORE", "json")
+os.environ.setdefault("WARMUP_ON_STARTUP", "false")
+os.chdir(tempfile.mkdtemp(prefix="bench-load-"))
+
+import httpx
+from starlette.testclient import TestClient
+
+from benchmarks.fake_telegram import FakeWorld
+
+SCENARIOS = ["dialogs", "dialogs_force", "messages", "avatars", "uploads", "fanout"]
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def report(name: str, latencies: List[float], errors: int, elapsed: float) -> dict:
+    count = len(latencies)
+    return {
+        "scenario": name,
+        "requests": count,
+        "errors": errors,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "throughput": count / elapsed if elapsed else 0.0,
+    }
+
+
+def print_table(results: List[dict]):
+    print(f"{'scenario':<16}{'requests':>10}{'errors':>8}{'p50 ms':>10}{'p99 ms':>10}{'req/s':>12}")
+    for r in results:
+        print(
+            f"{r['scenario']:<16}{r['requests']:>10}{r['errors']:>8}"
+            f"{r['p50_ms']:>10.2f}{r['p99_ms']:>10.2f}{r['throughput']:>12.1f}"
+        )
+
+
+async def run_http(
+    app,
+    name: str,
+    make_request: Callable[[httpx.AsyncClient, int], Awaitable[httpx.Response]],
+    total: int,
+    concurrency: int
+) -> dict:
+    """Fire `total` requests with at most `concurrency` in flight"""
+    latencies: List[float] = []
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as http:
+        async def one(i: int):
+            nonlocal errors
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    response = await make_request(http, i)
+                    if response.status_code >= 400:
+                        errors += 1
+                except Exception:
+                    errors += 1
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(total)))
+        elapsed = time.perf_counter() - started
+    return report(name, latencies, errors, elapsed)
+
+
+def http_scenarios(world: FakeWorld, sessions: List[str], upload_bytes: int) -> Dict[str, Callable]:
+    users = [user.id for user in world.users]
+    payload = os.urandom(upload_bytes)
+
+    def session(i: int) -> str:
+        return sessions[i % len(sessions)]
+
+    def dialogs(http, i):
+        return http.get("/api/chats/dialogs", params={"session_id": session(i), "limit": 100})
+
+    def dialogs_force(http, i):
+        return http.get("/api/chats/dialogs", params={"session_id": session(i), "limit": 100, "force": True})
+
+    def messages(http, i):
+        chat = users[i % len(users)]
+        offset = world.random.choice([0, 0, world.messages_per_chat // 2, world.messages_per_chat // 4])
+        return http.get(f"/api/messages/{chat}", params={"session_id": session(i), "limit": 50, "offset_id": offset})
+
+    def avatars(http, i):
+        return http.get(f"/api/chats/avatar/{users[i % len(users)]}", params={"session_id": session(i)})
+
+    def uploads(http, i):
+        return http.post(
+            "/api/media/upload",
+            params={"session_id": session(i), "chat_id": users[i % len(users)]},
+            files={"file": ("bench.bin", payload, "application/octet-stream")}
+        )
+
+    return {
+        "dialogs": dialogs,
+        "dialogs_force": dialogs_force,
+        "messages": messages,
+        "avatars": avatars,
+        "uploads": uploads,
+    }
+
+
+def run_fanout(test_client: TestClient, world: FakeWorld, sessions: List[str], sockets: int, total_events: int) -> dict:
+    """Emit NewMessage updates on every session and time their delivery to each socket"""
+    from app.telegram_client import telegram_manager
+
+    latencies: List[float] = []
+    lock = threading.Lock()
+    per_session = max(1, total_events // len(sessions))
+    connections = []
+    for session_id in sessions:
+        for _ in range(sockets):
+            ws = test_client.websocket_connect(f"/ws?session_id={session_id}")
+            connections.append(ws.__enter__())
+
+    def read(ws):
+        received = 0
+        while received < per_session:
+            message = json.loads(ws.receive_text())
+            data = message.get("data") or {}
+            if message.get("event") != "new_message" or not str(data.get("text", "")).startswith("bench "):
+                continue
+            sent_at = float(data["text"].split()[1])
+            with lock:
+                latencies.append(time.perf_counter() - sent_at)
+            received += 1
+
+    readers = [threading.Thread(target=read, args=(ws,), daemon=True) for ws in connections]
+    for reader in readers:
+        reader.start()
+
+    async def emit():
+        clients = [telegram_manager.clients[session_id] for session_id in sessions]
+        chat = world.users[0].id
+        for _ in range(per_session):
+            for client in clients:
+                await client.emit(client.new_message_event(chat, f"bench {time.perf_counter()}"))
+
+    started = time.perf_counter()
+    test_client.portal.call(emit)
+    for reader in readers:
+        reader.join(timeout=60)
+    elapsed = time.perf_counter() - started
+
+    for ws in connections:
+        ws.__exit__(None, None, None)
+
+    expected = per_session * len(connections)
+    result = report("fanout", latencies, expected - len(latencies), elapsed)
+    result["handlers_per_client"] = max(
+        len(telegram_manager.clients[s].list_event_handlers()) for s in sessions
+        if s in telegram_manager.clients
+    )
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the app against a fake Telegram backend")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Comma-separated subset of: " + ", ".join(SCENARIOS))
+    parser.add_argument("--sessions", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=500, help="Requests per HTTP scenario")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--dialogs", type=int, default=200, help="Dialogs per account")
+    parser.add_argument("--messages-per-chat", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0.0, help="Simulated RPC latency (seconds)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Extra random latency (seconds)")
+    parser.add_argument("--flood-rate", type=float, default=0.0, help="Probability of FloodWait per RPC")
+    parser.add_argument("--flood-seconds", type=int, default=1)
+    parser.add_argument("--upload-bytes", type=int, default=256 * 1024)
+    parser.add_argument("--sockets", type=int, default=4, help="WebSockets per session for fan-out")
+    parser.add_argument("--events", type=int, default=1000, help="Updates emitted for fan-out")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    world = FakeWorld(
+        dialogs=args.dialogs,
+        messages_per_chat=args.messages_per_chat,
+        latency=args.latency,
+        jitter=args.jitter,
+        flood_rate=args.flood_rate,
+        flood_seconds=args.flood_seconds
+    )
+    world.install()
+
+    from app.main import app
+    from app.telegram_client import telegram_manager
+
+    sessions = [f"bench-{i}" for i in range(args.sessions)]
+    for session_id in sessions:
+        telegram_manager.session_strings[session_id] = ""
+
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    requests = http_scenarios(world, sessions, args.upload_bytes)
+    results = []
+    with TestClient(app) as test_client:
+        for name in scenarios:
+            if name == "fanout":
+                results.append(run_fanout(test_client, world, sessions, args.sockets, args.events))
+            elif name in requests:
+                results.append(test_client.portal.call(
+                    run_http, app, name, requests[name], args.requests, args.concurrency
+                ))
+            else:
+                parser.error(f"unknown scenario: {name}")
+
+    if args.json:
+        print(json.dumps({"results": results, "rpc_counts": world.rpc_counts, "flood_waits": world.flood_waits}, indent=2))
+    else:
+        print_table(results)
+        print(f"RPCs: {sum(world.rpc_counts.values())}, FloodWaits injected: {world.flood_waits}")
+
+
+if __name__ == "__main__":
+    main()
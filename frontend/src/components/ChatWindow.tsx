@@ -26,6 +26,9 @@ import {
 } from 'lucide-react';
 import type { Message } from '../types';
 
+// Longest side (px) of inline photo previews: 2x the 400px bubble height
+const PREVIEW_SIZE = 800;
+
 // Avatar gradient colors - Telegram style
 const avatarColors = [
   ['#FF885E', '#FF516A'],
@@ -72,7 +75,8 @@ export const ChatWindow: React.FC = () => {
     y: number;
     message: Message;
   } | null>(null);
-  const [mediaPreviews, setMediaPreviews] = useState<Record<string, string>>({});
+  // `${chatId}-${messageId}` of photos whose preview is ready on the server
+  const [mediaPreviews, setMediaPreviews] = useState<Record<string, boolean>>({});
   const loadingPreviewsRef = useRef<Set<string>>(new Set());
   const [isLoadingMessages, setIsLoadingMessages] = useState(false);
 
@@ -81,42 +85,32 @@ export const ChatWindow: React.FC = () => {
                        contacts.find((c) => c.id === activeChat);
   const chatMessages = activeChat ? messages[activeChat] || [] : [];
 
-  // Load media previews for photo messages
-  const loadMediaPreview = useCallback(async (chatId: number, messageId: number) => {
-    const key = `${chatId}-${messageId}`;
-    if (loadingPreviewsRef.current.has(key) || !auth.sessionId) return;
-
-    // Check if already loaded
-    setMediaPreviews(prev => {
-      if (prev[key]) return prev;
-
-      // Not loaded, start loading
-      loadingPreviewsRef.current.add(key);
-
-      mediaApi.getPreview(auth.sessionId!, chatId, messageId)
-        .then(result => {
-          if (result?.preview) {
-            setMediaPreviews(p => ({ ...p, [key]: result.preview }));
-          }
-        })
-        .catch(err => console.error('Failed to load preview:', err))
-        .finally(() => {
-          loadingPreviewsRef.current.delete(key);
-        });
-
-      return prev;
+  // Load media previews for photo messages, one streamed batch per chat window
+  const loadMediaPreviews = useCallback((chatId: number, messageIds: number[]) => {
+    if (!auth.sessionId) return;
+
+    // loadingPreviewsRef holds every preview already requested
+    const ids = messageIds.filter(id => !loadingPreviewsRef.current.has(`${chatId}-${id}`));
+    if (ids.length === 0) return;
+    ids.forEach(id => loadingPreviewsRef.current.add(`${chatId}-${id}`));
+
+    mediaApi.warmPreviews(auth.sessionId, chatId, ids, PREVIEW_SIZE, (messageId) => {
+      setMediaPreviews(p => ({ ...p, [`${chatId}-${messageId}`]: true }));
+    }).catch(err => {
+      console.error('Failed to load previews:', err);
+      // Allow a retry on the next render
+      ids.forEach(id => loadingPreviewsRef.current.delete(`${chatId}-${id}`));
     });
   }, [auth.sessionId]);
 
   // Load previews for visible photo messages
   useEffect(() => {
     if (!activeChat) return;
-    chatMessages.forEach(msg => {
-      if (msg.media_type === 'photo') {
-        loadMediaPreview(activeChat, msg.id);
-      }
-    });
-  }, [activeChat, chatMessages, loadMediaPreview]);
+    const photoIds = chatMessages
+      .filter(msg => msg.media_type === 'photo')
+      .map(msg => msg.id);
+    loadMediaPreviews(activeChat, photoIds);
+  }, [activeChat, chatMessages, loadMediaPreviews]);
 
   useEffect(() => {
     const loadChatMessages = async () => {
@@ -358,7 +352,7 @@ export const ChatWindow: React.FC = () => {
                         {mediaPreviews[`${activeChat}-${message.id}`] ? (
                           <div className="relative group cursor-pointer">
                             <img
-                              src={`data:image/jpeg;base64,${mediaPreviews[`${activeChat}-${message.id}`]}`}
+                              src={mediaApi.getThumbUrl(auth.sessionId!, activeChat, message.id, { size: PREVIEW_SIZE })}
                               alt="Photo"
                               className="max-w-full max-h-[400px] object-contain"
                             />
@@ -391,7 +385,7 @@ export const ChatWindow: React.FC = () => {
                             <Play size={28} className="text-white ml-1" />
                           </div>
                           <a
-                            href={auth.sessionId ? mediaApi.getDownloadUrl(auth.sessionId, activeChat!, message.id) : '#'}
+                            href={auth.sessionId ? mediaApi.getStreamUrl(auth.sessionId, activeChat!, message.id) : '#'}
                             target="_blank"
                             rel="noopener noreferrer"
                             className="absolute top-2 right-2 w-8 h-8 bg-black/50 rounded-full flex items-center justify-center opacity-0 group-hover:opacity-100 transition-opacity"
@@ -22,26 +22,16 @@ export const MediaViewer: React.FC<MediaViewerProps> = ({
   const [error, setError] = useState<string | null>(null);
 
   useEffect(() => {
-    const loadPreview = async () => {
-      if (!auth.sessionId) return;
-
-      setLoading(true);
-      setError(null);
-
-      try {
-        const result = await mediaApi.getPreview(auth.sessionId, chatId, messageId);
-        setPreview(`data:${result.type};base64,${result.preview}`);
-      } catch (err) {
-        setError('Failed to load preview');
-        console.error('Failed to load preview:', err);
-      } finally {
-        setLoading(false);
-      }
-    };
+    if (!auth.sessionId) return;
 
-    if (mediaType === 'photo' || mediaType === 'video') {
-      loadPreview();
+    setError(null);
+    // Binary URLs: the browser loads, caches and (for video) streams them itself
+    if (mediaType === 'photo') {
+      setPreview(mediaApi.getThumbUrl(auth.sessionId, chatId, messageId, { full: true }));
+    } else if (mediaType === 'video') {
+      setPreview(mediaApi.getStreamUrl(auth.sessionId, chatId, messageId));
     }
+    setLoading(false);
   }, [auth.sessionId, chatId, messageId, mediaType]);
 
   const handleDownload = () => {
@@ -105,6 +95,7 @@ export const MediaViewer: React.FC<MediaViewerProps> = ({
               src={preview}
               alt="Media preview"
               className="max-w-full max-h-[80vh] object-contain"
+              onError={() => setError('Failed to load preview')}
             />
           ) : mediaType === 'video' ? (
             <video
@@ -112,6 +103,7 @@ export const MediaViewer: React.FC<MediaViewerProps> = ({
               controls
               autoPlay
               className="max-w-full max-h-[80vh]"
+              onError={() => setError('Failed to load video')}
             />
           ) : null
         ) : (
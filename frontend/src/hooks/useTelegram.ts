@@ -15,7 +15,6 @@ export const useTelegram = () => {
     setIsLoading,
     setError,
     avatars,
-    setAvatars,
     setAvatar,
   } = useChatStore();
   const [authStep, setAuthStep] = useState<'phone' | 'code' | '2fa' | 'done'>('phone');
@@ -198,19 +197,12 @@ export const useTelegram = () => {
     if (uncachedIds.length === 0) return;
 
     try {
-      const result = await chatsApi.getAvatars(auth.sessionId, uncachedIds);
-      if (result && Object.keys(result).length > 0) {
-        // Convert string keys to number keys (JSON serializes int keys as strings)
-        const normalized: Record<number, string> = {};
-        for (const [key, value] of Object.entries(result)) {
-          normalized[Number(key)] = value;
-        }
-        setAvatars(normalized);
-      }
+      // Avatars arrive one by one as the backend resolves them
+      await chatsApi.streamAvatars(auth.sessionId, uncachedIds, setAvatar);
     } catch (err) {
       console.error('Failed to load avatars:', err);
     }
-  }, [auth.sessionId, avatars, setAvatars]);
+  }, [auth.sessionId, avatars, setAvatar]);
 
   // Load single avatar
   const loadAvatar = useCallback(async (entityId: number) => {
@@ -1,18 +1,26 @@
 import { useEffect, useRef, useCallback } from 'react';
 import { useChatStore } from '../store/chatStore';
+import { chatsApi, messagesApi } from '../services/api';
 import type { Message, WSMessage } from '../types';
 
 export const useWebSocket = () => {
   const socketRef = useRef<WebSocket | null>(null);
   const reconnectTimeoutRef = useRef<ReturnType<typeof setTimeout>>();
-  const { auth, addMessage, updateMessage, removeMessages, updateDialog } = useChatStore();
+  // Last event seq received; a reconnect asks the server to replay everything after it
+  const lastSeqRef = useRef<number | null>(null);
+  const {
+    auth, addMessage, updateMessage, removeMessages, updateDialog, setDialogs, setMessages,
+  } = useChatStore();
 
   const connect = useCallback(() => {
     if (!auth.sessionId || socketRef.current?.readyState === WebSocket.OPEN) {
       return;
     }
 
-    const wsUrl = `${window.location.protocol === 'https:' ? 'wss:' : 'ws:'}//${window.location.host}/ws?session_id=${auth.sessionId}`;
+    let wsUrl = `${window.location.protocol === 'https:' ? 'wss:' : 'ws:'}//${window.location.host}/ws?session_id=${auth.sessionId}`;
+    if (lastSeqRef.current !== null) {
+      wsUrl += `&last_seq=${lastSeqRef.current}`;
+    }
 
     socketRef.current = new WebSocket(wsUrl);
 
@@ -23,7 +31,17 @@ export const useWebSocket = () => {
     socketRef.current.onmessage = (event) => {
       try {
         const message: WSMessage = JSON.parse(event.data);
-        handleMessage(message);
+        if (message.seq !== undefined) {
+          const expected = lastSeqRef.current === null ? message.seq : lastSeqRef.current + 1;
+          lastSeqRef.current = message.seq;
+          if (message.seq > expected) {
+            // The server dropped events for this socket under backpressure
+            resync();
+          }
+        }
+        // Coalesced presence/typing/edit updates arrive together as one `batch` frame
+        const messages = message.event === 'batch' ? (message.data as WSMessage[]) : [message];
+        messages.forEach(handleMessage);
       } catch (err) {
         console.error('Failed to parse WebSocket message:', err);
       }
@@ -42,6 +60,20 @@ export const useWebSocket = () => {
     };
   }, [auth.sessionId]);
 
+  // Too many events were missed to replay: reload the dialog list and the open chat
+  const resync = useCallback(async () => {
+    if (!auth.sessionId) return;
+    try {
+      setDialogs(await chatsApi.getDialogs(auth.sessionId, 300));
+      const chatId = useChatStore.getState().activeChat;
+      if (chatId !== null) {
+        setMessages(chatId, await messagesApi.getMessages(auth.sessionId, chatId));
+      }
+    } catch (err) {
+      console.error('Failed to resync after reconnect:', err);
+    }
+  }, [auth.sessionId, setDialogs, setMessages]);
+
   const handleMessage = useCallback((message: WSMessage) => {
     switch (message.event) {
       case 'new_message': {
@@ -69,6 +101,16 @@ export const useWebSocket = () => {
         console.log('User update:', message.data);
         break;
       }
+      case 'upload_progress': {
+        // Upload progress is informational for now
+        break;
+      }
+      case 'resync_required': {
+        const data = message.data as { seq: number };
+        lastSeqRef.current = data.seq;
+        resync();
+        break;
+      }
       case 'pong': {
         // Heartbeat response
         break;
@@ -76,7 +118,7 @@ export const useWebSocket = () => {
       default:
         console.log('Unknown event:', message.event);
     }
-  }, [addMessage, updateMessage, removeMessages, updateDialog]);
+  }, [addMessage, updateMessage, removeMessages, updateDialog, resync]);
 
   const send = useCallback((event: string, data: unknown) => {
     if (socketRef.current?.readyState === WebSocket.OPEN) {
@@ -104,6 +146,11 @@ export const useWebSocket = () => {
     send('start_typing', { chat_id: chatId });
   }, [send]);
 
+  useEffect(() => {
+    // A different session starts a different stream
+    lastSeqRef.current = null;
+  }, [auth.sessionId]);
+
   useEffect(() => {
     if (auth.isAuthenticated && auth.sessionId) {
       connect();
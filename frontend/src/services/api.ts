@@ -10,6 +10,27 @@ const api = axios.create({
   },
 });
 
+// Read a newline-delimited JSON response, calling onLine for each object as it arrives
+const readNdjson = async <T,>(response: Response, onLine: (item: T) => void): Promise<void> => {
+  if (!response.ok || !response.body) {
+    throw new Error(`Stream request failed: ${response.status}`);
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  for (;;) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    const lines = buffer.split('\n');
+    buffer = lines.pop() ?? '';
+    for (const line of lines) {
+      if (line) onLine(JSON.parse(line) as T);
+    }
+  }
+};
+
 // Auth API
 export const authApi = {
   sendCode: async (phone: string): Promise<{ phone_code_hash: string; session_id: string }> => {
@@ -85,10 +106,8 @@ export const chatsApi = {
   },
 
   getAvatar: async (sessionId: string, entityId: number): Promise<string | null> => {
-    const response = await api.get(`/chats/avatar/${entityId}`, {
-      params: { session_id: sessionId },
-    });
-    return response.data.avatar;
+    const avatars = await chatsApi.getAvatars(sessionId, [entityId]);
+    return avatars[entityId] ?? null;
   },
 
   getAvatars: async (sessionId: string, entityIds: number[]): Promise<Record<number, string>> => {
@@ -100,6 +119,24 @@ export const chatsApi = {
     return response.data.avatars;
   },
 
+  streamAvatars: async (
+    sessionId: string,
+    entityIds: number[],
+    onAvatar: (entityId: number, avatar: string) => void
+  ): Promise<void> => {
+    const response = await fetch(
+      `${API_BASE}/chats/avatars/stream?session_id=${encodeURIComponent(sessionId)}`,
+      {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ entity_ids: entityIds }),
+      }
+    );
+    await readNdjson<{ id: number; avatar: string | null }>(response, ({ id, avatar }) => {
+      if (avatar) onAvatar(id, avatar);
+    });
+  },
+
   markAsRead: async (sessionId: string, chatId: number): Promise<void> => {
     await api.post(`/chats/mark-read/${chatId}`, null, {
       params: { session_id: sessionId },
@@ -197,13 +234,53 @@ export const mediaApi = {
     return `${API_BASE}/media/download/${chatId}/${messageId}?session_id=${sessionId}`;
   },
 
+  getStreamUrl: (sessionId: string, chatId: number, messageId: number): string => {
+    return `${API_BASE}/media/stream/${chatId}/${messageId}?session_id=${sessionId}`;
+  },
+
+  getThumbUrl: (
+    sessionId: string,
+    chatId: number,
+    messageId: number,
+    options: { full?: boolean; size?: number } = {}
+  ): string => {
+    const params = new URLSearchParams({ session_id: sessionId });
+    if (options.full) params.set('full', 'true');
+    if (options.size) params.set('size', String(options.size));
+    return `${API_BASE}/media/thumb/${chatId}/${messageId}?${params}`;
+  },
+
+  // Warm the server's preview cache for many messages in one request; each ready
+  // preview is then loaded as a binary, browser-cached image from getThumbUrl
+  warmPreviews: async (
+    sessionId: string,
+    chatId: number,
+    messageIds: number[],
+    size: number,
+    onReady: (messageId: number) => void
+  ): Promise<void> => {
+    const params = new URLSearchParams({ session_id: sessionId, size: String(size), inline: 'false' });
+    const response = await fetch(`${API_BASE}/media/previews/${chatId}?${params}`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ message_ids: messageIds }),
+    });
+    await readNdjson<{ message_id: number; ready: boolean }>(
+      response,
+      ({ message_id, ready }) => {
+        if (ready) onReady(message_id);
+      }
+    );
+  },
+
   getPreview: async (
     sessionId: string,
     chatId: number,
-    messageId: number
+    messageId: number,
+    size?: number
   ): Promise<{ preview: string; type: string }> => {
     const response = await api.get(`/media/preview/${chatId}/${messageId}`, {
-      params: { session_id: sessionId },
+      params: { session_id: sessionId, size },
     });
     return response.data;
   },
@@ -51,4 +51,6 @@ export interface AuthState {
 export interface WSMessage {
   event: string;
   data: unknown;
+  // Per-session sequence number, sent back as last_seq on reconnect
+  seq?: number;
 }